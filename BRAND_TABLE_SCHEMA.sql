@@ -50,6 +50,7 @@ BEGIN
     EXECUTE format('CREATE INDEX IF NOT EXISTS idx_%I_analyzed_at ON %I(analyzed_at)', table_name, table_name);
     EXECUTE format('CREATE INDEX IF NOT EXISTS idx_%I_location ON %I(latitude, longitude)', table_name, table_name);
     EXECUTE format('CREATE INDEX IF NOT EXISTS idx_%I_ripeness ON %I(ripeness_score)', table_name, table_name);
+    EXECUTE format('CREATE INDEX IF NOT EXISTS idx_%I_created_at ON %I(created_at)', table_name, table_name);
 
     -- Enable Row Level Security
     EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', table_name);
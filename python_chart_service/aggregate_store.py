@@ -0,0 +1,543 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from data_source import DEFAULT_PAGE_SIZE, check_table_name
+from geo import GEO_BASE_CELL, bin_scans, cell_index
+from scan_frame import (
+    HISTOGRAM_BINS, SHELF_LIFE_BUCKETS, SHELF_LIFE_DAYS, histogram_bins, histogram_quantiles, load_scan_frame,
+    shelf_life_bucket,
+)
+
+# Columns fetched when folding new scans into the rollups
+ROLLUP_COLUMNS = ['analyzed_at', 'ripeness_score', 'latitude', 'longitude', 'created_at', 'id']
+
+# Bumped when the rollup tables change; older stores are rebuilt from scratch
+STORE_VERSION = 4
+
+# Lower bound of the first refresh of a table; rows without a created_at
+# never match it, since they can't be placed relative to a watermark
+ROLLUP_EPOCH = '1970-01-01T00:00:00+00:00'
+
+# Window of the rolling mean in the summary, and the modified z-score (of a
+# day's mean against the window's median day) above which a day is flagged
+ROLLING_DAYS = 7
+ANOMALY_Z = 3.5
+# Fewest days with data before any day is flagged as an anomaly
+ANOMALY_MIN_DAYS = 7
+
+STORE_SQL = """
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    table_name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    very_ripe INTEGER NOT NULL,
+    just_ripe INTEGER NOT NULL,
+    unripe INTEGER NOT NULL,
+    latest TEXT NOT NULL,
+    histogram BLOB NOT NULL,
+    PRIMARY KEY (table_name, day)
+);
+CREATE TABLE IF NOT EXISTS cell_rollups (
+    table_name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    lat_cell INTEGER NOT NULL,
+    lng_cell INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    very_ripe INTEGER NOT NULL,
+    PRIMARY KEY (table_name, day, lat_cell, lng_cell)
+);
+CREATE INDEX IF NOT EXISTS idx_cell_rollups_cell ON cell_rollups (table_name, lat_cell, lng_cell);
+CREATE TABLE IF NOT EXISTS watermarks (
+    table_name TEXT PRIMARY KEY,
+    created_at TEXT,
+    row_id TEXT,
+    refreshed_at REAL NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS applied_rows (
+    table_name TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (table_name, row_id)
+);
+CREATE INDEX IF NOT EXISTS idx_applied_rows_created_at ON applied_rows (table_name, created_at);
+CREATE TABLE IF NOT EXISTS models (
+    table_name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    watermark TEXT NOT NULL,
+    model TEXT NOT NULL,
+    fitted_at REAL NOT NULL,
+    PRIMARY KEY (table_name, kind)
+);
+CREATE TABLE IF NOT EXISTS rankings (
+    period TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    average_ripeness REAL NOT NULL,
+    very_ripe_share REAL NOT NULL,
+    just_ripe_share REAL NOT NULL,
+    unripe_share REAL NOT NULL,
+    average_shelf_life REAL NOT NULL,
+    latest TEXT NOT NULL,
+    rank_ripeness INTEGER NOT NULL,
+    rank_shelf_life_share INTEGER NOT NULL,
+    rank_volume INTEGER NOT NULL,
+    start_day TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (period, table_name)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rankings_ripeness ON rankings (period, rank_ripeness);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rankings_shelf_life_share ON rankings (period, rank_shelf_life_share);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rankings_volume ON rankings (period, rank_volume);
+"""
+
+# Rebuilds one period of the rankings from the daily rollups of the listed
+# tables; every ranking breaks ties by scan count, then table name
+RANKINGS_SQL = """
+INSERT INTO rankings
+SELECT :period, table_name, count, average_ripeness, very_ripe_share, just_ripe_share, unripe_share,
+       average_shelf_life, latest,
+       ROW_NUMBER() OVER (ORDER BY average_ripeness DESC, count DESC, table_name),
+       ROW_NUMBER() OVER (ORDER BY unripe_share DESC, count DESC, table_name),
+       ROW_NUMBER() OVER (ORDER BY count DESC, table_name),
+       :start_day, :refreshed_at
+FROM (
+    SELECT table_name,
+           SUM(count) AS count,
+           SUM(sum) / SUM(count) AS average_ripeness,
+           1.0 * SUM(very_ripe) / SUM(count) AS very_ripe_share,
+           1.0 * SUM(just_ripe) / SUM(count) AS just_ripe_share,
+           1.0 * SUM(unripe) / SUM(count) AS unripe_share,
+           (SUM(very_ripe) * :very_ripe_days + SUM(just_ripe) * :just_ripe_days + SUM(unripe) * :unripe_days)
+               / SUM(count) AS average_shelf_life,
+           MAX(latest) AS latest
+    FROM daily_rollups
+    WHERE day >= :start_day AND table_name IN (SELECT value FROM json_each(:tables))
+    GROUP BY table_name
+)
+"""
+
+# Orderings the rankings can be read in, and the rank column for each
+RANKING_SORTS = {
+    'ripeness': 'rank_ripeness',
+    'shelf_life_share': 'rank_shelf_life_share',
+    'volume': 'rank_volume',
+}
+
+# Every per-table table of the store
+STORE_TABLES = ('daily_rollups', 'cell_rollups', 'watermarks', 'applied_rows', 'models', 'rankings')
+
+UPSERT_SQL = """
+INSERT INTO daily_rollups (table_name, day, count, sum, min, max, very_ripe, just_ripe, unripe, latest, histogram)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (table_name, day) DO UPDATE SET
+    count = count + excluded.count,
+    sum = sum + excluded.sum,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    very_ripe = very_ripe + excluded.very_ripe,
+    just_ripe = just_ripe + excluded.just_ripe,
+    unripe = unripe + excluded.unripe,
+    latest = MAX(latest, excluded.latest),
+    histogram = merge_histograms(histogram, excluded.histogram)
+"""
+
+UPSERT_CELL_SQL = """
+INSERT INTO cell_rollups (table_name, day, lat_cell, lng_cell, count, sum, very_ripe)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (table_name, day, lat_cell, lng_cell) DO UPDATE SET
+    count = count + excluded.count,
+    sum = sum + excluded.sum,
+    very_ripe = very_ripe + excluded.very_ripe
+"""
+
+def encode_histogram(counts):
+    return np.asarray(counts, dtype='<i4').tobytes()
+
+def decode_histograms(blobs):
+    """Stacked histograms (one row per blob)"""
+    return np.frombuffer(b''.join(blobs), dtype='<i4').reshape(-1, HISTOGRAM_BINS)
+
+def merge_histograms(a, b):
+    """SQLite function adding two stored histograms"""
+    return encode_histogram(decode_histograms([a, b]).sum(axis=0))
+
+def rollup_frame(frame):
+    """Fold a scan frame into per-day (UTC) count/sum/min/max/bucket/histogram rollups"""
+    scores = frame['ripeness_score'].to_numpy()
+    buckets = shelf_life_bucket(scores)
+    frame = frame.assign(
+        # Truncating datetime64 to days is much faster than strftime
+        day=frame['analyzed_at'].dt.tz_convert(None).to_numpy().astype('datetime64[D]').astype(str),
+        very_ripe=buckets == 0,
+        just_ripe=buckets == 1,
+        unripe=buckets == 2,
+    )
+    rollups = frame.groupby('day').agg(
+        count=('ripeness_score', 'size'),
+        sum=('ripeness_score', 'sum'),
+        min=('ripeness_score', 'min'),
+        max=('ripeness_score', 'max'),
+        very_ripe=('very_ripe', 'sum'),
+        just_ripe=('just_ripe', 'sum'),
+        unripe=('unripe', 'sum'),
+        latest=('analyzed_at', 'max'),
+    )
+    # One (day x bin) count matrix for the whole frame
+    day_codes = rollups.index.get_indexer(frame['day'])
+    histograms = np.zeros((len(rollups), HISTOGRAM_BINS), dtype=np.int64)
+    np.add.at(histograms, (day_codes, histogram_bins(scores)), 1)
+    rollups['histogram'] = [encode_histogram(row) for row in histograms]
+    return rollups
+
+def rollup_rows(rows):
+    """Fold raw scan rows into per-day rollups"""
+    return rollup_frame(load_scan_frame(rows))
+
+def frame_rollups(frame):
+    """Daily rollups of a scan frame, in the same shape as AggregateStore.daily()"""
+    daily = rollup_frame(frame)
+    daily['latest'] = daily['latest'].map(lambda ts: ts.isoformat())
+    daily.index = pd.to_datetime(daily.index, utc=True)
+    return daily
+
+class AggregateStore:
+    """Persistent per-table daily rollups, kept current by a created_at watermark.
+
+    refresh() fetches the rows created since `lag` seconds before the newest
+    created_at applied so far and merges them into the daily rollups one
+    page at a time, so an interrupted refresh resumes where it stopped.
+    Rows are not committed in created_at order (concurrent inserts stamp
+    created_at when their transaction starts), so that lag window is read
+    again on every refresh; the ids applied within it are kept in
+    applied_rows and skipped, which makes refreshing idempotent. Rows
+    without a created_at are never rolled up.
+
+    Summaries and shelf-life charts then read O(days) rollup rows instead
+    of rescanning the table. The same pass keeps per-day rollups of each
+    GEO_BASE_CELL grid cell for the geo heatmap. Models fitted to the
+    rollups (see forecast.py) are stored with the watermark they were
+    fitted at, so they are refit only once new rows have been applied.
+    """
+
+    def __init__(self, path, data_source, page_size=DEFAULT_PAGE_SIZE, lag=300):
+        self.path = path
+        self.data_source = data_source
+        self.page_size = page_size
+        self.lag = lag
+        self._table_locks = {}  # table -> lock held while its rollups are refreshed
+        self._lock = threading.Lock()
+        with closing(self.connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] < STORE_VERSION:
+                # Rollups from an older version have an older schema; drop them
+                # and the watermarks so every table is recomputed on its next refresh
+                for table in STORE_TABLES:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+            conn.execute("COMMIT")
+            conn.executescript(STORE_SQL)
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.create_function('merge_histograms', 2, merge_histograms, deterministic=True)
+        return conn
+
+    def watermark(self, table_name):
+        """(newest created_at applied, its id, refreshed_at, rows applied) of a table"""
+        with closing(self.connect()) as conn:
+            row = conn.execute(
+                "SELECT created_at, row_id, refreshed_at, rows FROM watermarks WHERE table_name = ?", (table_name,)
+            ).fetchone()
+        return tuple(row) if row else (None, None, None, 0)
+
+    def since(self, created_at):
+        """Where a refresh from the watermark created_at starts reading: `lag` seconds earlier"""
+        if created_at is None:
+            return ROLLUP_EPOCH
+        start = pd.Timestamp(created_at) - pd.Timedelta(seconds=self.lag)
+        if start.tzinfo is None:
+            start = start.tz_localize('UTC')
+        return start.tz_convert('UTC').isoformat(timespec='microseconds')
+
+    def refresh(self, table_name):
+        """Merge rows created since the watermark (less the lag) into the rollups; returns rows applied"""
+        check_table_name(table_name)
+        # Per table, so a long first build of one table doesn't hold up the others
+        with self._table_lock(table_name):
+            created_at, _, _, _ = self.watermark(table_name)
+            applied = 0
+            for page in self.data_source.iter_pages(table_name, ROLLUP_COLUMNS, start=self.since(created_at),
+                                                    page_size=self.page_size, order_by='created_at'):
+                applied += self._apply_page(table_name, page)
+            self._touch(table_name)
+            if applied:
+                print(f"Applied {applied} new records to {table_name} rollups")
+            return applied
+
+    def refresh_if_stale(self, table_name, max_age, changed_at=None):
+        """Refresh a table unless it was refreshed within the last max_age seconds (and since changed_at)"""
+        _, _, refreshed_at, _ = self.watermark(table_name)
+        if refreshed_at is None or time.time() - refreshed_at >= max_age \
+                or (changed_at is not None and changed_at > refreshed_at):
+            return self.refresh(table_name)
+        return 0
+
+    def rebuild(self, table_name):
+        """Drop a table's rollups and watermark and recompute them from scratch"""
+        check_table_name(table_name)
+        with self._table_lock(table_name), closing(self.connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for table in STORE_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE table_name = ?", (table_name,))
+            conn.execute("COMMIT")
+        return self.refresh(table_name)
+
+    def daily(self, table_name, start_day=None, end_day=None):
+        """Daily rollups for [start_day, end_day) as a frame indexed by day"""
+        clauses, args = ["table_name = ?"], [table_name]
+        if start_day:
+            clauses.append("day >= ?")
+            args.append(start_day)
+        if end_day:
+            clauses.append("day < ?")
+            args.append(end_day)
+        with closing(self.connect()) as conn:
+            daily = pd.read_sql_query(
+                f"SELECT * FROM daily_rollups WHERE {' AND '.join(clauses)} ORDER BY day", conn, params=args
+            )
+        daily['day'] = pd.to_datetime(daily['day'], utc=True)
+        return daily.drop(columns='table_name').set_index('day')
+
+    def cells(self, table_name, start_day=None, end_day=None, bbox=None):
+        """Base grid cells summed over [start_day, end_day).
+
+        With a bbox, only cells whose south-west corner lies in [south, north)
+        x [west, east) are returned, so a cell-aligned box gets exactly the
+        cells inside it.
+        """
+        clauses, args = ["table_name = ?"], [table_name]
+        if start_day:
+            clauses.append("day >= ?")
+            args.append(start_day)
+        if end_day:
+            clauses.append("day < ?")
+            args.append(end_day)
+        if bbox:
+            west, south, east, north = bbox
+            clauses.append("lat_cell >= ? AND lat_cell < ? AND lng_cell >= ? AND lng_cell < ?")
+            args += [int(cell_index(south)), int(cell_index(north)), int(cell_index(west)), int(cell_index(east))]
+        with closing(self.connect()) as conn:
+            return pd.read_sql_query(
+                f"SELECT lat_cell, lng_cell, SUM(count) AS count, SUM(sum) AS sum, SUM(very_ripe) AS very_ripe "
+                f"FROM cell_rollups WHERE {' AND '.join(clauses)} GROUP BY lat_cell, lng_cell",
+                conn, params=args,
+            )
+
+    def model(self, table_name, kind):
+        """A model fitted to the table's rollups, if it was fitted at the current watermark"""
+        with closing(self.connect()) as conn:
+            row = conn.execute(
+                "SELECT watermark, model FROM models WHERE table_name = ? AND kind = ?", (table_name, kind)
+            ).fetchone()
+        if row is None or row['watermark'] != model_key(self.watermark(table_name)):
+            return None
+        return json.loads(row['model'])
+
+    def save_model(self, table_name, kind, model, watermark):
+        """Store a model fitted at watermark (as returned by watermark() before reading the rollups)"""
+        with closing(self.connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO models (table_name, kind, watermark, model, fitted_at) VALUES (?, ?, ?, ?, ?)",
+                (table_name, kind, model_key(watermark), json.dumps(model), time.time()),
+            )
+
+    def tables(self):
+        """Tables that have rollups"""
+        with closing(self.connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT table_name FROM watermarks ORDER BY table_name")]
+
+    def refresh_rankings(self, tables, periods, today):
+        """Rebuild the cross-table rankings of every period ({name: days}) ending on day `today`.
+
+        Each period is replaced in one transaction from the daily rollups,
+        so readers see either the old or the new rankings, never a mix.
+        """
+        refreshed_at = time.time()
+        with closing(self.connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for period, days in periods.items():
+                start_day = (pd.Timestamp(today) - pd.Timedelta(days=days - 1)).strftime('%Y-%m-%d')
+                conn.execute("DELETE FROM rankings WHERE period = ?", (period,))
+                conn.execute(RANKINGS_SQL, dict(
+                    zip(('very_ripe_days', 'just_ripe_days', 'unripe_days'), SHELF_LIFE_DAYS.tolist()),
+                    period=period, start_day=start_day, refreshed_at=refreshed_at, tables=json.dumps(list(tables)),
+                ))
+            conn.execute("COMMIT")
+
+    def rankings(self, period, sort, limit, after=0):
+        """(rows ranked after `after` by sort, at most limit; total ranked) for a period, read by index"""
+        rank = RANKING_SORTS[sort]
+        with closing(self.connect()) as conn:
+            rows = conn.execute(
+                f"SELECT *, {rank} AS rank FROM rankings WHERE period = ? AND {rank} > ? ORDER BY {rank} LIMIT ?",
+                (period, after, limit),
+            ).fetchall()
+            total = conn.execute("SELECT COUNT(*) FROM rankings WHERE period = ?", (period,)).fetchone()[0]
+        return [dict(row) for row in rows], total
+
+    def _table_lock(self, table_name):
+        with self._lock:
+            return self._table_locks.setdefault(table_name, threading.Lock())
+
+    def _apply_page(self, table_name, page):
+        """Merge the rows of a page not applied yet, in one transaction; returns rows applied"""
+        with closing(self.connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Checked under the write lock, so concurrent refreshes (in this or
+            # another process) never apply a row twice
+            seen = {row[0] for row in conn.execute(
+                "SELECT row_id FROM applied_rows WHERE table_name = ? AND row_id IN "
+                "(SELECT value FROM json_each(?))", (table_name, json.dumps([row['id'] for row in page])),
+            )}
+            page = [row for row in page if row['id'] not in seen]
+            if not page:
+                conn.execute("ROLLBACK")
+                return 0
+            rollups = rollup_rows(page)
+            cells = bin_scans(page, GEO_BASE_CELL, by_day=True)
+            conn.executemany(UPSERT_SQL, [
+                (table_name, day, int(count), float(total), float(low), float(high),
+                 int(very_ripe), int(just_ripe), int(unripe), latest.isoformat(), histogram)
+                for day, count, total, low, high, very_ripe, just_ripe, unripe, latest, histogram
+                in rollups.reset_index().itertuples(index=False, name=None)
+            ])
+            conn.executemany(UPSERT_CELL_SQL, [
+                (table_name, day, int(lat_cell), int(lng_cell), int(count), float(total), int(very_ripe))
+                for day, lat_cell, lng_cell, count, total, very_ripe in cells.itertuples(index=False, name=None)
+            ])
+            conn.executemany(
+                "INSERT INTO applied_rows (table_name, row_id, created_at) VALUES (?, ?, ?)",
+                [(table_name, row['id'], row['created_at']) for row in page],
+            )
+            current = conn.execute(
+                "SELECT created_at, row_id, rows FROM watermarks WHERE table_name = ?", (table_name,)
+            ).fetchone()
+            # Late rows are older than the watermark and leave it where it is
+            newest = max((row['created_at'], row['id']) for row in page)
+            if current and current['created_at'] and (current['created_at'], current['row_id']) > newest:
+                newest = (current['created_at'], current['row_id'])
+            conn.execute(
+                "INSERT OR REPLACE INTO watermarks (table_name, created_at, row_id, refreshed_at, rows) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (table_name, newest[0], newest[1], time.time(), (current['rows'] if current else 0) + len(page)),
+            )
+            conn.execute("COMMIT")
+        return len(page)
+
+    def _touch(self, table_name):
+        """Mark a table refreshed now, and forget applied ids that no refresh reads again"""
+        with closing(self.connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO watermarks (table_name, refreshed_at) VALUES (?, ?) "
+                "ON CONFLICT (table_name) DO UPDATE SET refreshed_at = excluded.refreshed_at",
+                (table_name, time.time()),
+            )
+            created_at = conn.execute(
+                "SELECT created_at FROM watermarks WHERE table_name = ?", (table_name,)
+            ).fetchone()[0]
+            conn.execute(
+                "DELETE FROM applied_rows WHERE table_name = ? AND created_at < ?", (table_name, self.since(created_at))
+            )
+            conn.execute("COMMIT")
+
+def model_key(watermark):
+    """What a stored model is keyed on: the watermark and how many rows the rollups hold"""
+    created_at, row_id, _, rows = watermark
+    return json.dumps([created_at, row_id, rows])
+
+def summarize_rollups(daily):
+    """Window statistics from daily rollups, all derived from per-day sums and histograms.
+
+    Percentiles come from the merged histograms, so they are read from
+    stored rollups as cheaply as the mean. The trend is the least-squares
+    slope of the daily means per day; days whose mean has a modified
+    z-score (against the median day, scaled by the median absolute
+    deviation) above ANOMALY_Z are flagged.
+    """
+    counts = daily['count'].to_numpy()
+    total = int(counts.sum())
+    means = daily['sum'] / daily['count']
+
+    # Count-weighted mean over the trailing ROLLING_DAYS calendar days
+    rolling = daily[['sum', 'count']].rolling(f'{ROLLING_DAYS}D').sum()
+    rolling_mean = rolling['sum'] / rolling['count']
+
+    days = ((daily.index - daily.index[0]) / pd.Timedelta(days=1)).to_numpy()
+    slope = float(np.polyfit(days, means.to_numpy(), 1)[0]) if len(daily) >= 2 else 0.0
+
+    anomalous = np.zeros(len(daily), dtype=bool)
+    if len(daily) >= ANOMALY_MIN_DAYS:
+        median = means.median()
+        mad = (means - median).abs().median()
+        if mad > 0:
+            anomalous = (0.6745 * (means - median).abs() / mad > ANOMALY_Z).to_numpy()
+
+    return {
+        'count': total,
+        'mean': float(daily['sum'].sum()) / total,
+        'latest': daily['latest'].max(),
+        'percentiles': dict(zip(('p10', 'p50', 'p90'), histogram_quantiles(
+            decode_histograms(daily['histogram']).sum(axis=0), (0.1, 0.5, 0.9)))),
+        'bucket_shares': {bucket: int(daily[bucket].sum()) / total for bucket in SHELF_LIFE_BUCKETS},
+        'slope': slope,
+        'daily': pd.DataFrame({
+            'count': counts,
+            'mean': means,
+            'rolling_mean': rolling_mean,
+            'anomaly': anomalous,
+        }, index=daily.index),
+    }
+
+def daily_shelf_life(daily):
+    """Average estimated shelf life per day from the bucket counts"""
+    buckets = daily[SHELF_LIFE_BUCKETS].to_numpy()
+    return pd.Series(buckets @ SHELF_LIFE_DAYS / daily['count'].to_numpy(), index=daily.index)
+
+def main():
+    from config import (
+        SUPABASE_URL, SUPABASE_KEY, DATA_SOURCE, LOCAL_DATA_PATH, FETCH_PAGE_SIZE, AGGREGATE_DB_PATH,
+        AGGREGATE_REFRESH_LAG,
+    )
+    from data_source import create_data_source
+
+    parser = argparse.ArgumentParser(description="Refresh or rebuild the chart service's daily rollups")
+    parser.add_argument('command', choices=['refresh', 'rebuild'])
+    parser.add_argument('tables', nargs='+')
+    args = parser.parse_args()
+
+    data_source = create_data_source(DATA_SOURCE, SUPABASE_URL, SUPABASE_KEY, LOCAL_DATA_PATH)
+    store = AggregateStore(AGGREGATE_DB_PATH, data_source, FETCH_PAGE_SIZE, AGGREGATE_REFRESH_LAG)
+    for table in args.tables:
+        started = time.perf_counter()
+        try:
+            applied = store.rebuild(table) if args.command == 'rebuild' else store.refresh(table)
+            print(f"✅ {args.command} {table}: {applied} rows in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"❌ Could not {args.command} {table}: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+# Benchmark the chart endpoints against generated brand tables:
+#   python benchmark.py --sizes 10000 100000 1000000 --output bench.json
+#   python benchmark.py --sizes 100000 --baseline bench.json
+#   python benchmark.py --startup-only
+#
+# Each size runs in a fresh process, so peak RSS is per size. Tables are
+# served through InMemorySupabase, an in-process stand-in for the Supabase
+# client, so the real SupabaseDataSource paging, coalescing and rollup code
+# runs without a live project.
+#
+# Every run also measures startup: importing chart_generator and answering
+# /health in a fresh interpreter (checked against IMPORT_BUDGET_MS), and the
+# time until preload() has made the worker ready.
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+BENCH_TABLE = 'bench_data'
+BENCH_EMAIL = 'bench@example.com'
+
+ENDPOINTS = {
+    'ripeness_chart': f'/generate_ripeness_chart/{BENCH_EMAIL}',
+    'shelf_life_chart': f'/generate_shelf_life_chart/{BENCH_EMAIL}',
+    'supplier_summary': f'/supplier_summary/{BENCH_EMAIL}',
+}
+
+DISTRIBUTIONS = ['uniform', 'normal', 'bimodal']
+
+# Most time importing chart_generator may take, and modules that import must
+# leave to the routes (or preload) that need them
+IMPORT_BUDGET_MS = 400
+DEFERRED_MODULES = ['pandas', 'numpy', 'matplotlib', 'supabase', 'httpx']
+
+# Run in a fresh interpreter by measure_startup(); prints one JSON line
+STARTUP_SCRIPT = """
+import contextlib, json, sys, time
+started = time.perf_counter()
+import chart_generator
+imported = time.perf_counter() - started
+loaded = [name for name in sys.argv[1:] if name in sys.modules]
+chart_generator.app.test_client().get('/health')
+health = time.perf_counter() - started
+with contextlib.redirect_stdout(sys.stderr):
+    chart_generator.preload()
+ready = time.perf_counter() - started
+print(json.dumps({'import': imported, 'health': health, 'ready': ready, 'loaded': loaded}))
+"""
+
+def generate_table(rows, days=30, distribution='uniform', seed=0):
+    """Columns of a synthetic brand table, sorted by analyzed_at"""
+    rng = np.random.default_rng(seed)
+    end = np.datetime64('2025-09-01T00:00:00', 'us')
+    analyzed = np.sort(end - (rng.random(rows) * days * 86400e6).astype('timedelta64[us]'))
+    created = analyzed + (rng.random(rows) * 60e6).astype('timedelta64[us]')
+    if distribution == 'normal':
+        scores = rng.normal(7.5, 2.5, rows)
+    elif distribution == 'bimodal':
+        scores = np.where(rng.random(rows) < 0.5, rng.normal(3, 1.2, rows), rng.normal(11, 1.5, rows))
+    else:
+        scores = rng.uniform(0, 15, rows)
+    return {
+        'id': np.array([f'00000000-0000-4000-8000-{n:012x}' for n in range(rows)]),
+        'ripeness_score': np.clip(scores, 0, 15).round(2),
+        'latitude': (34.05 + rng.uniform(-0.1, 0.1, rows)).round(6),
+        'longitude': (-118.24 + rng.uniform(-0.1, 0.1, rows)).round(6),
+        'location_description': np.full(rows, 'Benchmark'),
+        'fruit_type': np.full(rows, 'Orange'),
+        'analyzed_at': iso_strings(analyzed),
+        'created_at': iso_strings(created),
+    }
+
+def iso_strings(times):
+    """UTC timestamps formatted the way PostgREST returns timestamptz columns"""
+    return np.char.add(np.datetime_as_string(times, unit='us'), '+00:00')
+
+class InMemoryTable:
+    """The subset of the PostgREST query builder used by SupabaseDataSource"""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.columns = None
+        self.count = None
+        self.bounds = []
+        self.after = None
+        self.orders = []
+        self.row_limit = None
+
+    def select(self, columns, count=None):
+        self.columns = None if columns == '*' else columns.split(',')
+        self.count = count
+        return self
+
+    def gte(self, column, value):
+        self.bounds.append((column, 'gte', value))
+        return self
+
+    def lt(self, column, value):
+        self.bounds.append((column, 'lt', value))
+        return self
+
+    def or_(self, filters):
+        # Only the keyset filter: col.gt."v",and(col.eq."v",id.gt."id")
+        match = re.fullmatch(r'(\w+)\.gt\."(.*)",and\(\1\.eq\."\2",id\.gt\."(.*)"\)', filters)
+        if not match:
+            raise NotImplementedError(f"Unsupported filter: {filters}")
+        self.after = (match.group(1), match.group(2), match.group(3))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size):
+        self.row_limit = size
+        return self
+
+    def execute(self):
+        return self.client.execute(self)
+
+class InMemoryResponse:
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+class InMemorySupabase:
+    """In-process stand-in for the Supabase client, serving generated tables.
+
+    Queries are answered with binary searches over (order column, id) sorted
+    copies of each table, and responses go through a JSON round trip so the
+    client-side parse cost matches a real PostgREST response.
+    """
+
+    def __init__(self, tables, wire_json=True):
+        self.tables = tables
+        self.wire_json = wire_json
+        self.queries = 0
+        self._sorted = {}
+
+    def table(self, name):
+        return InMemoryTable(self, name)
+
+    def sorted_table(self, name, column):
+        if (name, column) not in self._sorted:
+            table = self.tables[name]
+            order = np.lexsort((table['id'], table[column]))
+            self._sorted[name, column] = {key: values[order] for key, values in table.items()}
+        return self._sorted[name, column]
+
+    def execute(self, query):
+        from postgrest.exceptions import APIError
+
+        self.queries += 1
+        if query.name not in self.tables:
+            raise APIError({'code': '42P01', 'message': f'relation "{query.name}" does not exist'})
+        column, desc = query.orders[0] if query.orders else ('id', False)
+        table = self.sorted_table(query.name, column)
+        keys = table[column]
+
+        low, high = 0, len(keys)
+        for bound_column, op, value in query.bounds:
+            if bound_column != column:
+                raise NotImplementedError("Range filters must be on the order column")
+            if op == 'gte':
+                low = max(low, np.searchsorted(keys, value, 'left'))
+            else:
+                high = min(high, np.searchsorted(keys, value, 'left'))
+        if query.after:
+            _, value, row_id = query.after
+            first = np.searchsorted(keys, value, 'left')
+            last = np.searchsorted(keys, value, 'right')
+            low = max(low, first + np.searchsorted(table['id'][first:last], row_id, 'right'))
+
+        count = max(high - low, 0)
+        limit = query.row_limit if query.row_limit is not None else count
+        rows = range(high - 1, max(high - 1 - limit, low - 1), -1) if desc else range(low, min(low + limit, high))
+        columns = query.columns or list(table)
+        data = [{name: table[name][i].item() for name in columns} for i in rows]
+        if self.wire_json:
+            data = json.loads(json.dumps(data))
+        return InMemoryResponse(data, count if query.count else None)
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        'n': len(samples),
+        'mean_ms': round(float(samples.mean()), 3),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p90_ms': round(float(np.percentile(samples, 90)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+    }
+
+def time_stages(source, chart):
+    """Seconds spent in each stage of one chart or summary, outside Flask"""
+    import chart_generator
+    from chart_render import CHART_DPI, render_ripeness_chart, render_shelf_life_chart
+    from data_source import CHART_COLUMNS
+    from metrics import collect_spans
+    from scan_frame import daily_means, load_scan_frame
+
+    stages = {}
+    started = time.perf_counter()
+    rows = source.fetch_rows(BENCH_TABLE, CHART_COLUMNS)
+    stages['fetch'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    frame = load_scan_frame(rows)
+    stages['parse'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if chart == 'supplier_summary':
+        chart_generator.build_summary(chart_generator.summarize_frame(frame))
+        stages['aggregate'] = time.perf_counter() - started
+        return stages
+    if chart == 'shelf_life_chart':
+        data, render = daily_means(frame, 'shelf_life'), render_shelf_life_chart
+    else:
+        data, render = chart_generator.ripeness_plot(frame, CHART_DPI), render_ripeness_chart
+    stages['aggregate'] = time.perf_counter() - started
+
+    # The chart templates time their own render and encode stages
+    _, seconds = collect_spans(render, data, BENCH_EMAIL, 'png', CHART_DPI)
+    stages.update(render=seconds['render'], encode=seconds['encode'])
+    return stages
+
+def run_size(rows, days, distribution, seed, iterations):
+    """Benchmark every endpoint against one table size (runs in its own process)"""
+    # Keep the service's request logging out of the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        return _run_size(rows, days, distribution, seed, iterations)
+
+def _run_size(rows, days, distribution, seed, iterations):
+    workdir = tempfile.mkdtemp(prefix='chart-bench-')
+    os.environ.update(
+        CHART_RENDER_WORKERS='0',
+        CHART_AGGREGATE_DB=os.path.join(workdir, 'aggregates.db'),
+        CHART_CACHE_DIR='',
+    )
+    import chart_generator
+    from aggregate_store import AggregateStore
+    from chart_render import warm_up
+    from config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, FETCH_PAGE_SIZE
+    from data_client import CircuitBreaker, DataClient
+    from data_source import SupabaseDataSource
+    from table_registry import TableRegistry
+
+    started = time.perf_counter()
+    client = InMemorySupabase({BENCH_TABLE: generate_table(rows, days, distribution, seed)})
+    generate_s = time.perf_counter() - started
+
+    source = DataClient(SupabaseDataSource(None, None, client=client),
+                        CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT))
+    chart_generator.data_source = source
+    chart_generator.table_registry = TableRegistry(source)
+    chart_generator.aggregate_store = AggregateStore(
+        os.environ['CHART_AGGREGATE_DB'], source, FETCH_PAGE_SIZE)
+    warm_up()
+    app = chart_generator.app.test_client()
+
+    endpoints = {}
+    for name, path in ENDPOINTS.items():
+        # The first request pays for building the daily rollups (summary, shelf life)
+        started = time.perf_counter()
+        response = app.get(path)
+        first = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+        cold, warm = [], []
+        for _ in range(iterations):
+            chart_generator.chart_cache.clear()
+            chart_generator._fingerprints.clear()
+            started = time.perf_counter()
+            app.get(path)
+            cold.append(time.perf_counter() - started)
+        for _ in range(iterations):
+            started = time.perf_counter()
+            app.get(path)
+            warm.append(time.perf_counter() - started)
+
+        stages = [time_stages(source.source, name) for _ in range(max(iterations // 2, 1))]
+        endpoints[name] = {
+            'first_request_ms': round(first * 1000, 3),
+            'cold': percentiles(cold),
+            'warm': percentiles(warm),
+            'rows_per_s': round(rows / float(np.median(cold)), 1),
+            'stages_ms': {stage: round(float(np.median([s[stage] for s in stages])) * 1000, 3)
+                          for stage in stages[0]},
+            'response_bytes': len(response.get_data()),
+        }
+
+    return {
+        'rows': rows,
+        'generate_s': round(generate_s, 3),
+        'backend_queries': client.queries,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'endpoints': endpoints,
+    }
+
+def direct_imports(importtime_log, module='chart_generator'):
+    """Cumulative ms of each module a module imports directly, from a -X importtime log"""
+    children = {}
+    for line in importtime_log.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)', line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match[1]), len(match[2]) // 2, match[3]
+        if depth == 0:
+            if name == module:
+                return children
+            children = {}
+        elif depth == 1:
+            children[name] = cumulative / 1000
+    return {}
+
+def measure_startup(iterations):
+    """Import, /health and ready times of a new worker, each run in a fresh interpreter"""
+    workdir = tempfile.mkdtemp(prefix='chart-startup-')
+    env = dict(os.environ, CHART_DATA_SOURCE='sqlite', CHART_DATA_PATH=os.path.join(workdir, 'empty.db'),
+               CHART_AGGREGATE_DB=os.path.join(workdir, 'aggregates.db'), CHART_RENDER_WORKERS='0',
+               CHART_CACHE_DIR='')
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    runs, imports = [], {}
+    for i in range(iterations):
+        # The first run also logs per-module import times
+        flags = ['-X', 'importtime'] if i == 0 else []
+        process = subprocess.run([sys.executable, *flags, '-c', STARTUP_SCRIPT, *DEFERRED_MODULES],
+                                 capture_output=True, text=True, check=True, cwd=cwd, env=env)
+        runs.append(json.loads(process.stdout.splitlines()[-1]))
+        if flags:
+            imports = direct_imports(process.stderr)
+
+    import_p50 = percentiles([run['import'] for run in runs])['p50_ms']
+    return {
+        'import': percentiles([run['import'] for run in runs]),
+        'health': percentiles([run['health'] for run in runs]),
+        'ready': percentiles([run['ready'] for run in runs]),
+        'import_budget_ms': IMPORT_BUDGET_MS,
+        'within_budget': import_p50 <= IMPORT_BUDGET_MS and not runs[0]['loaded'],
+        'loaded_at_import': runs[0]['loaded'],
+        'slowest_imports_ms': dict(sorted(imports.items(), key=lambda item: -item[1])[:8]),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+def compare(results, baseline):
+    """Print startup and cold p50 changes against a previous results file"""
+    if results.get('startup') and baseline.get('startup'):
+        before, now = baseline['startup']['import']['p50_ms'], results['startup']['import']['p50_ms']
+        print(f"\nImport p50 vs {baseline.get('commit') or 'baseline'}: {before:.1f}ms -> {now:.1f}ms "
+              f"({now / before - 1:+.0%})")
+    previous = {(size['rows'], name): endpoint['cold']['p50_ms']
+                for size in baseline['results'] for name, endpoint in size['endpoints'].items()}
+    print(f"\nCold p50 vs {baseline.get('commit') or 'baseline'}:")
+    for size in results['results']:
+        for name, endpoint in size['endpoints'].items():
+            before = previous.get((size['rows'], name))
+            if before:
+                now = endpoint['cold']['p50_ms']
+                print(f"  {size['rows']:>9} {name:<18} {before:9.1f}ms -> {now:9.1f}ms ({now / before - 1:+.0%})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chart endpoints on generated data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--startup-iterations', type=int, default=5)
+    parser.add_argument('--startup-only', action='store_true', help="Only measure startup")
+    parser.add_argument('--output', help="Write results JSON here (default: print to stdout)")
+    parser.add_argument('--baseline', help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'days': args.days, 'distribution': args.distribution, 'seed': args.seed,
+                   'iterations': args.iterations},
+        'results': [],
+    }
+    print("Measuring startup...", file=sys.stderr)
+    startup = results['startup'] = measure_startup(args.startup_iterations)
+    if not startup['within_budget']:
+        print(f"⚠️  Startup over budget: import p50 {startup['import']['p50_ms']:.1f}ms "
+              f"(budget {IMPORT_BUDGET_MS}ms), loaded at import: {startup['loaded_at_import'] or 'none'}",
+              file=sys.stderr)
+    for rows in [] if args.startup_only else args.sizes:
+        print(f"Benchmarking {rows} rows...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            results['results'].append(executor.submit(
+                run_size, rows, args.days, args.distribution, args.seed, args.iterations).result())
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Wrote {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from data_source import BRAND_COLUMNS, check_table_name, create_data_source
+
+# Columns parsed as numbers when reading CSV files
+NUMERIC_COLUMNS = ['ripeness_score', 'latitude', 'longitude']
+
+# Scan locations per brand for synthetic rows (same areas as the populate scripts)
+BRAND_LOCATIONS = {
+    'sunkist': [
+        (34.0522, -118.2437),  # Los Angeles
+        (34.4208, -119.6982),  # Ventura
+        (36.7378, -119.7871),  # Fresno
+        (35.3733, -119.0187),  # Bakersfield
+        (33.9425, -117.2297),  # Riverside
+    ],
+    'halos': [
+        (39.9526, -75.1652),  # Philadelphia Center
+        (40.0378, -75.3426),  # King of Prussia
+        (39.8781, -75.2803),  # Drexel Hill
+        (40.0583, -75.0862),  # Bensalem
+        (39.8365, -75.3780),  # Media
+    ],
+}
+
+# Namespace for the deterministic ids given to rows that don't carry one
+ROW_ID_NAMESPACE = uuid.UUID('6f1c2a52-8d3e-4b8e-9a57-2f0f4c1d9e11')
+
+def row_id(*parts):
+    """Stable uuid for a row, so re-sending it after a crash is a no-op"""
+    return str(uuid.uuid5(ROW_ID_NAMESPACE, ':'.join(str(part) for part in parts)))
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield {key: (float(value) if key in NUMERIC_COLUMNS else value) if value != '' else None
+                   for key, value in row.items()}
+
+def read_jsonl(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_parquet(path, batch_size=10000):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        for row in batch.to_pylist():
+            if isinstance(row.get('analyzed_at'), datetime):
+                row['analyzed_at'] = row['analyzed_at'].isoformat()
+            yield row
+
+def synthetic_rows(table_name, count, seed, days, chunk_size, anchor=None):
+    """Random scans over the `days` days before `anchor` (an ISO date, default today), as (chunk number, loader) pairs.
+
+    Every chunk has its own seeded generator, so a resumed load can skip
+    finished chunks without generating them and still produce the same rows,
+    as long as it is given the same anchor.
+    """
+    brand = table_name[:-len('_data')] if table_name.endswith('_data') else table_name
+    locations = BRAND_LOCATIONS.get(brand, BRAND_LOCATIONS['sunkist'])
+    anchor = anchor or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    base_date = datetime.fromisoformat(anchor).replace(tzinfo=timezone.utc) - timedelta(days=days)
+
+    def chunk(index):
+        rng = random.Random(f"{seed}:{index}")
+        for n in range(index * chunk_size, min((index + 1) * chunk_size, count)):
+            lat, lng = rng.choice(locations)
+            lat += rng.uniform(-0.1, 0.1)
+            lng += rng.uniform(-0.1, 0.1)
+            yield {
+                'id': row_id(table_name, seed, n),
+                'ripeness_score': round(rng.uniform(0, 15), 2),
+                'latitude': round(lat, 6),
+                'longitude': round(lng, 6),
+                'location_description': f"{lat:.4f}, {lng:.4f}",
+                'fruit_type': 'Orange',
+                'analyzed_at': (base_date + timedelta(days=rng.uniform(0, days))).isoformat(),
+            }
+
+    for index in range(-(-count // chunk_size)):
+        yield index, lambda index=index: list(chunk(index))
+
+def file_chunks(rows, table_name, source, chunk_size):
+    """Split a row stream into chunks, filling in ids from the row position"""
+    for index in itertools.count():
+        batch = list(itertools.islice(rows, chunk_size))
+        if not batch:
+            return
+        for n, row in enumerate(batch, index * chunk_size):
+            if not row.get('id'):
+                row['id'] = row_id(table_name, source, n)
+        yield index, lambda batch=batch: batch
+
+class Checkpoint:
+    """Which chunks of a load have been written, persisted after every chunk.
+
+    Chunks finish out of order when batches run concurrently, so the set of
+    finished chunk numbers is stored rather than a single offset. The load's
+    table, source and chunk size are stored too; resuming with different ones
+    would map chunk numbers to different rows, so it is refused. So is the
+    anchor date synthetic rows are generated back from: a resumed load keeps
+    the saved one, even on a later day.
+    """
+
+    def __init__(self, path, load, anchor=None):
+        self.path = path
+        self.load = load
+        self.anchor = anchor
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved['load'] != load:
+                raise ValueError(f"Checkpoint {path} belongs to a different load: {saved['load']}")
+            self.anchor = saved.get('anchor')
+            self.done = set(saved['done'])
+
+    def mark(self, index):
+        self.done.add(index)
+        if self.path:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'load': self.load, 'anchor': self.anchor, 'done': sorted(self.done)}, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+# Columns written by a load; created_at is left to the database, which
+# stamps it as each chunk is inserted, so the rollups pick the rows up (a
+# created_at carried over from an export would predate their watermark)
+LOAD_COLUMNS = [column for column in BRAND_COLUMNS if column != 'created_at']
+
+def prepare_rows(rows):
+    """Keep only the columns a load writes"""
+    return [{column: row.get(column) for column in LOAD_COLUMNS} for row in rows]
+
+def insert_with_retry(target, table_name, rows, attempts, backoff):
+    """Insert one chunk, retrying backend failures with exponential backoff and jitter"""
+    for attempt in range(1, attempts + 1):
+        try:
+            target.insert_rows(table_name, rows)
+            return
+        except Exception as e:
+            if attempt == attempts or not target.is_backend_error(e):
+                raise
+            delay = backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            print(f"⚠️  Insert failed ({e}), retrying in {delay:.1f}s ({attempt}/{attempts})")
+            time.sleep(delay)
+
+def load_table(target, table_name, chunks, checkpoint, concurrency=4, attempts=5, backoff=0.5):
+    """Insert every unfinished chunk with up to `concurrency` batches in flight; returns rows written.
+
+    chunks yields (chunk number, loader) pairs and is consumed lazily, so at
+    most 2 * concurrency chunks of a large file are held in memory.
+    """
+    if checkpoint.done:
+        print(f"Resuming: skipping {len(checkpoint.done)} chunks already loaded")
+    todo = ((index, chunk) for index, chunk in chunks if index not in checkpoint.done)
+
+    written = 0
+    started = last_report = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+        while True:
+            # Keep a bounded number of chunks materialized and in flight
+            for index, chunk in itertools.islice(todo, concurrency * 2 - len(pending)):
+                rows = prepare_rows(chunk())
+                future = executor.submit(insert_with_retry, target, table_name, rows, attempts, backoff)
+                pending[future] = (index, len(rows))
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, count = pending.pop(future)
+                future.result()
+                checkpoint.mark(index)
+                written += count
+
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                print(f"  {written} rows, {written / (now - started):.0f} rows/s")
+                last_report = now
+    return written
+
+def main():
+    from config import SUPABASE_URL, SUPABASE_KEY
+
+    parser = argparse.ArgumentParser(description="Bulk load historical scans into a {brand}_data table")
+    parser.add_argument('table')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv')
+    source.add_argument('--jsonl')
+    source.add_argument('--parquet')
+    source.add_argument('--synthetic', type=int, metavar='ROWS', help="Generate this many random scans")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for --synthetic")
+    parser.add_argument('--days', type=int, default=10, help="Days of history for --synthetic")
+    parser.add_argument('--target', choices=['supabase', 'sqlite'], default='supabase')
+    parser.add_argument('--path', default='local_data.db', help="SQLite database file for --target sqlite")
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <table>.checkpoint.json)")
+    args = parser.parse_args()
+
+    table_name = check_table_name(args.table)
+    if args.synthetic is not None:
+        load = {'synthetic': args.synthetic, 'seed': args.seed, 'days': args.days}
+    else:
+        path, reader = next((path, reader) for path, reader in (
+            (args.csv, read_csv), (args.jsonl, read_jsonl), (args.parquet, read_parquet)) if path)
+        load = {'file': os.path.abspath(path)}
+        chunks = file_chunks(reader(path), table_name, load['file'], args.chunk_size)
+    load.update(table=table_name, target=args.target, chunk_size=args.chunk_size)
+
+    anchor = datetime.now(timezone.utc).strftime('%Y-%m-%d') if args.synthetic is not None else None
+    checkpoint = Checkpoint(args.checkpoint or f"{table_name}.checkpoint.json", load, anchor)
+    if args.synthetic is not None:
+        chunks = synthetic_rows(table_name, args.synthetic, args.seed, args.days, args.chunk_size, checkpoint.anchor)
+    target = create_data_source(args.target, SUPABASE_URL, SUPABASE_KEY, args.path)
+
+    print(f"=== Loading {table_name} into {args.target} in chunks of {args.chunk_size} ===\n")
+    started = time.perf_counter()
+    try:
+        written = load_table(target, table_name, chunks, checkpoint, args.concurrency, args.retries)
+    except Exception as e:
+        print(f"❌ Load stopped: {e}\n   Run the same command again to resume from {checkpoint.path}")
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - started
+    checkpoint.remove()
+    print(f"\n🎉 Loaded {written} rows into {table_name} in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+import io
+import threading
+
+import matplotlib
+matplotlib.use('Agg')  # Use non-interactive backend
+import matplotlib.dates as mdates
+import matplotlib.image as mimage
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+
+from config import CHART_DPI, CHART_FIGSIZE
+from geo import grid_values
+from metrics import stage
+from scan_frame import plot_times
+
+# Autoscale padding on the date axis, as a fraction of the plotted span
+X_MARGIN = 0.05
+
+# Date axes spanning up to this many days get a tick per day; longer ones get
+# at most MAX_DATE_TICKS ticks at whatever interval fits
+DAY_TICK_SPAN = 14
+MAX_DATE_TICKS = 16
+
+# Title suffix describing what the ripeness chart shows at each level of detail
+LOD_TITLES = {
+    'raw': '',
+    'lttb': ' (downsampled)',
+    'hour': ' (hourly min / mean / max)',
+    'day': ' (daily min / mean / max)',
+    'week': ' (weekly min / mean / max)',
+}
+
+class ChartTemplate:
+    """A chart figure whose static artists are built once per process.
+
+    Uses the object-oriented Figure/FigureCanvasAgg API rather than pyplot's
+    global state. The axes, grid, labels, formatters and any zones or legend
+    are created in build(); the layout is computed once with representative
+    content and then kept, so each render only swaps the data and the title
+    in update() before drawing.
+    """
+
+    title_format = '{name}'
+    xlabel = 'Date'
+    ylabel = ''
+    date_axis = True
+
+    def __init__(self):
+        self.figure = Figure(figsize=CHART_FIGSIZE, dpi=CHART_DPI)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.lock = threading.Lock()
+
+        self.title = self.ax.set_title('', fontsize=16, fontweight='bold', pad=20)
+        self.ax.set_xlabel(self.xlabel, fontsize=12)
+        self.ax.set_ylabel(self.ylabel, fontsize=12)
+        self.ax.grid(True, alpha=0.3)
+
+        if self.date_axis:
+            # Format x-axis (the locator is chosen per render from the span, see set_date_ticks)
+            self.ax.xaxis_date()
+            self.ax.tick_params(axis='x', labelrotation=45)
+
+        self.build()
+        self.layout()
+
+    def build(self):
+        """Create the static artists and the (empty) data artists"""
+
+    def update(self, x, y):
+        """Swap new data (date numbers, values) into the data artists"""
+        raise NotImplementedError
+
+    def layout(self):
+        """Fit the subplot to representative content once and keep it"""
+        x = mdates.date2num(np.arange('2025-01-01', '2025-01-08', dtype='datetime64[D]'))
+        self.title.set_text(self.title_format.format(name='Supplier'))
+        self.update(x, np.linspace(1, 14, len(x)))
+        self.figure.tight_layout()
+
+    def set_xlim(self, x):
+        low, high = self.ax.xaxis.get_major_locator().nonsingular(x.min(), x.max())
+        pad = (high - low) * X_MARGIN
+        self.ax.set_xlim(low - pad, high + pad)
+        self.set_date_ticks(high - low)
+
+    def set_date_ticks(self, span_days):
+        """Pick a date locator and format that keep the tick count bounded"""
+        if span_days < 2:
+            locator = mdates.AutoDateLocator(minticks=3, maxticks=MAX_DATE_TICKS)
+            formatter = mdates.ConciseDateFormatter(locator)
+        elif span_days <= DAY_TICK_SPAN:
+            locator = mdates.DayLocator(interval=1)
+            formatter = mdates.DateFormatter('%m/%d')
+        else:
+            locator = mdates.AutoDateLocator(minticks=3, maxticks=MAX_DATE_TICKS)
+            formatter = mdates.DateFormatter('%m/%d' if span_days <= 180 else '%Y-%m')
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(formatter)
+
+    def set_title(self, supplier_email, suffix=''):
+        self.title.set_text(self.title_format.format(name=supplier_email.split("@")[0].title()) + suffix)
+
+    def render(self, times, values, supplier_email, fmt='png', dpi=CHART_DPI):
+        """Draw the chart for the given series and return the encoded image bytes.
+
+        The layout is in inches, so a lower dpi gives a smaller image with
+        the same proportions (a thumbnail) without another layout pass.
+        """
+        with self.lock:
+            self.set_title(supplier_email)
+            self.update(mdates.date2num(plot_times(times)), np.asarray(values, dtype=float))
+            return self.encode(fmt, dpi)
+
+    def encode(self, fmt, dpi):
+        """Draw the figure and encode it, timing the two as separate stages.
+
+        Same output as figure.savefig(): raster formats are drawn at the
+        requested dpi and the pixel buffer is then compressed; SVG is drawn
+        and written in a single pass.
+        """
+        img_buffer = io.BytesIO()
+        if fmt == 'svg':
+            with stage('encode'):
+                self.figure.savefig(img_buffer, format=fmt, dpi=dpi)
+            return img_buffer.getvalue()
+
+        self.figure.dpi = dpi
+        try:
+            with stage('render'):
+                self.canvas.draw()
+            with stage('encode'):
+                mimage.imsave(img_buffer, self.canvas.buffer_rgba(), format=fmt, dpi=dpi)
+        finally:
+            self.figure.dpi = CHART_DPI
+        return img_buffer.getvalue()
+
+class RipenessTemplate(ChartTemplate):
+    title_format = 'Ripeness Scores Over Time - {name}'
+    ylabel = 'Ripeness Score'
+
+    def build(self):
+        # Color zones
+        self.ax.axhspan(0, 3, alpha=0.2, color='red', label='Very Ripe (0-3)')
+        self.ax.axhspan(3, 7, alpha=0.2, color='orange', label='Just Ripe (3-7)')
+        self.ax.axhspan(7, 15, alpha=0.2, color='green', label='Unripe (7-15)')
+        self.ax.legend(loc='upper right')
+        self.ax.set_ylim(0, 15)
+
+        self.line, = self.ax.plot([], [], marker='o', linewidth=2, markersize=6, color='#FF6B35')
+        # Min-max range of each bucket, shown when the scans are aggregated
+        self.band = self.ax.fill_between([0, 1], [0, 0], alpha=0.3, color='#FF6B35', linewidth=0)
+        self.band.set_visible(False)
+
+    def update(self, x, y, low=None, high=None):
+        self.line.set_data(x, y)
+        if low is None:
+            # Raw scans: one marker each, smaller when downsampled to many points
+            dense = len(x) > 200
+            self.line.set(marker='o', markersize=2 if dense else 6, linewidth=0.8 if dense else 2)
+            self.band.set_visible(False)
+        else:
+            self.line.set(marker='', linewidth=1.5)
+            self.band.set_verts([np.column_stack([np.concatenate([x, x[::-1]]),
+                                                  np.concatenate([low, high[::-1]])])])
+            self.band.set_visible(True)
+        self.set_xlim(x)
+
+    def render_plot(self, plot, supplier_email, fmt='png', dpi=CHART_DPI):
+        """Draw a level-of-detail RipenessPlot and return the encoded image bytes"""
+        frame = plot.frame
+        with self.lock:
+            self.set_title(supplier_email, LOD_TITLES[plot.level])
+            bands = (frame['low'].to_numpy(dtype=float), frame['high'].to_numpy(dtype=float)) \
+                if 'low' in frame else ()
+            self.update(mdates.date2num(plot_times(frame['analyzed_at'])),
+                        frame['ripeness_score'].to_numpy(dtype=float), *bands)
+            return self.encode(fmt, dpi)
+
+class ShelfLifeTemplate(ChartTemplate):
+    title_format = 'Average Shelf Life Over Time - {name}'
+    ylabel = 'Average Shelf Life (Days)'
+
+    def build(self):
+        self.line, = self.ax.plot([], [], marker='o', linewidth=3, markersize=8,
+                                  color='#4A90E2', markerfacecolor='white', markeredgewidth=2)
+        self.fill = self.ax.fill_between([0, 1], [0, 0], alpha=0.3, color='#4A90E2')
+        self.value_labels = []
+
+    def update(self, x, y):
+        self.line.set_data(x, y)
+        self.fill.set_verts([np.column_stack([
+            np.concatenate([[x[0]], x, [x[-1]]]),
+            np.concatenate([[0], y, [0]]),
+        ])])
+
+        # Add value labels on points
+        for label in self.value_labels:
+            label.remove()
+        self.value_labels = [
+            self.ax.annotate(f'{value:.1f}', (date, value),
+                             textcoords="offset points", xytext=(0, 10), ha='center', fontsize=9)
+            for date, value in zip(x, y)
+        ]
+
+        self.set_xlim(x)
+        self.ax.set_ylim(0, y.max() * 1.2)
+
+class ComparisonTemplate(ChartTemplate):
+    """Daily average ripeness of several suppliers overlaid on one chart"""
+
+    title_format = 'Average Ripeness by Supplier'
+    ylabel = 'Average Ripeness Score'
+
+    def build(self):
+        # Same ripeness zones as the single-supplier chart, without legend entries
+        self.ax.axhspan(0, 3, alpha=0.1, color='red')
+        self.ax.axhspan(3, 7, alpha=0.1, color='orange')
+        self.ax.axhspan(7, 15, alpha=0.1, color='green')
+        self.ax.set_ylim(0, 15)
+        # Lines are created as more suppliers are compared and reused afterwards
+        self.lines = []
+        self.legend = None
+
+    def update(self, x, y):
+        self.update_many([('Supplier', x, y)])
+
+    def update_many(self, series):
+        while len(self.lines) < len(series):
+            line, = self.ax.plot([], [], marker='o', linewidth=2, markersize=4)
+            self.lines.append(line)
+        for line, (name, x, y) in zip(self.lines, series):
+            line.set_data(x, y)
+            line.set_label(name)
+            line.set_visible(True)
+        for line in self.lines[len(series):]:
+            line.set_visible(False)
+
+        if self.legend is not None:
+            self.legend.remove()
+        self.legend = self.ax.legend(handles=self.lines[:len(series)], loc='upper right', fontsize=9)
+        self.set_xlim(np.concatenate([x for _, x, _ in series]))
+
+    def render_many(self, series_by_name, fmt='png', dpi=CHART_DPI):
+        """Draw one line per supplier and return the encoded image bytes"""
+        with self.lock:
+            self.title.set_text(self.title_format)
+            self.update_many([
+                (name, mdates.date2num(plot_times(values.index)), np.asarray(values, dtype=float))
+                for name, values in series_by_name.items()
+            ])
+            return self.encode(fmt, dpi)
+
+class HeatmapTemplate(ChartTemplate):
+    """Average ripeness per grid cell over a bounding box"""
+
+    title_format = 'Average Ripeness by Location - {name}'
+    xlabel = 'Longitude'
+    ylabel = 'Latitude'
+    date_axis = False
+
+    def build(self):
+        # Same scale as the ripeness zones: red is very ripe, green unripe
+        self.norm = Normalize(vmin=0, vmax=15)
+        self.cmap = matplotlib.colormaps['RdYlGn']
+        colorbar = self.figure.colorbar(ScalarMappable(self.norm, self.cmap), ax=self.ax)
+        colorbar.set_label('Average Ripeness Score', fontsize=12)
+        self.mesh = None
+
+    def layout(self):
+        self.title.set_text(self.title_format.format(name='Supplier'))
+        self.update_grid(np.linspace(-118.5, -117.5, 11), np.linspace(33.5, 34.5, 11), np.full((10, 10), 7.5))
+        self.figure.tight_layout()
+
+    def update_grid(self, lng_edges, lat_edges, values):
+        if self.mesh is not None:
+            self.mesh.remove()
+        self.mesh = self.ax.pcolormesh(lng_edges, lat_edges, np.ma.masked_invalid(values),
+                                       cmap=self.cmap, norm=self.norm, shading='flat')
+        # Show a degree of longitude at its true ground length for this
+        # latitude; the axes shrink inside the fixed layout to fit the box
+        self.ax.set_xlim(lng_edges[0], lng_edges[-1])
+        self.ax.set_ylim(lat_edges[0], lat_edges[-1])
+        self.ax.set_aspect(1 / np.cos(np.radians((lat_edges[0] + lat_edges[-1]) / 2)), adjustable='box')
+
+    def render_grid(self, grid, supplier_email, fmt='png', dpi=CHART_DPI):
+        """Draw a GeoGrid and return the encoded image bytes"""
+        with self.lock:
+            self.set_title(supplier_email)
+            self.update_grid(*grid_values(grid))
+            return self.encode(fmt, dpi)
+
+class ForecastTemplate(ChartTemplate):
+    """Projected expiring volume per day, with the expected shelf life of arriving scans"""
+
+    title_format = 'Shelf Life Forecast - {name}'
+    ylabel = 'Expected Scans Expiring'
+
+    def build(self):
+        self.bars = None
+        self.shelf_life_ax = self.ax.twinx()
+        self.shelf_life_ax.set_ylabel('Expected Shelf Life (Days)', fontsize=12)
+        self.shelf_life_ax.set_ylim(0, 10)
+        self.line, = self.shelf_life_ax.plot([], [], marker='o', linewidth=2, markersize=5, color='#4A90E2',
+                                             label='Expected shelf life')
+        self.ax.legend(handles=[Patch(color='#FF6B35', alpha=0.7, label='Expiring'), self.line],
+                       loc='upper left')
+
+    def update(self, x, y, shelf_life=None):
+        if self.bars is not None:
+            self.bars.remove()
+        self.bars = self.ax.bar(x, y, width=0.8, color='#FF6B35', alpha=0.7)
+        self.line.set_data(x, y if shelf_life is None else shelf_life)
+        self.set_xlim(x)
+        self.ax.set_ylim(0, max(float(y.max()), 1) * 1.2)
+
+    def render_forecast(self, frame, supplier_email, fmt='png', dpi=CHART_DPI):
+        """Draw a forecast frame (see forecast.forecast) and return the encoded image bytes"""
+        with self.lock:
+            self.set_title(supplier_email)
+            self.update(mdates.date2num(plot_times(frame.index)), frame['expiring'].to_numpy(dtype=float),
+                        frame['expected_shelf_life'].to_numpy(dtype=float))
+            return self.encode(fmt, dpi)
+
+# One instance of each template per process, created on first use
+_templates = {}
+_templates_lock = threading.Lock()
+
+def get_template(template_class):
+    with _templates_lock:
+        if template_class not in _templates:
+            _templates[template_class] = template_class()
+        return _templates[template_class]
+
+def warm_up():
+    """Build the chart templates and draw each once, loading fonts and caches"""
+    for template_class in (RipenessTemplate, ShelfLifeTemplate, ComparisonTemplate, HeatmapTemplate,
+                           ForecastTemplate):
+        get_template(template_class).canvas.draw()
+
+def render_ripeness_chart(plot, supplier_email, fmt='png', dpi=CHART_DPI):
+    """Render a RipenessPlot (see scan_frame.ripeness_lod) to image bytes (None if no valid points)"""
+    if plot.frame.empty:
+        return None
+    return get_template(RipenessTemplate).render_plot(plot, supplier_email, fmt, dpi)
+
+def render_shelf_life_chart(shelf_life_by_day, supplier_email, fmt='png', dpi=CHART_DPI):
+    """Render average shelf life per day to image bytes (None if no valid points)"""
+    if shelf_life_by_day.empty:
+        return None
+    return get_template(ShelfLifeTemplate).render(
+        shelf_life_by_day.index, shelf_life_by_day, supplier_email, fmt, dpi)
+
+def render_comparison_chart(ripeness_by_supplier, fmt='png', dpi=CHART_DPI):
+    """Render daily average ripeness per supplier on one chart (None if no points)"""
+    series = {name: values for name, values in ripeness_by_supplier.items() if not values.empty}
+    if not series:
+        return None
+    return get_template(ComparisonTemplate).render_many(series, fmt, dpi)
+
+def render_geo_heatmap(grid, supplier_email, fmt='png', dpi=CHART_DPI):
+    """Render a GeoGrid of per-cell average ripeness to image bytes (None if no cells)"""
+    if grid.cells.empty:
+        return None
+    return get_template(HeatmapTemplate).render_grid(grid, supplier_email, fmt, dpi)
+
+def render_forecast_chart(frame, supplier_email, fmt='png', dpi=CHART_DPI):
+    """Render a shelf-life forecast to image bytes (None if it has no days)"""
+    if frame.empty:
+        return None
+    return get_template(ForecastTemplate).render_forecast(frame, supplier_email, fmt, dpi)
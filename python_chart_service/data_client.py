@@ -0,0 +1,161 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from data_source import DataSource, DEFAULT_PAGE_SIZE
+
+class CircuitOpenError(Exception):
+    """The backend has failed repeatedly and calls are being short-circuited"""
+
+class CircuitBreaker:
+    """Stops calling a failing backend for a while instead of waiting on it.
+
+    After failure_threshold consecutive backend failures the circuit opens
+    and calls fail immediately with CircuitOpenError. Once reset_timeout
+    seconds have passed a single trial call is let through: success closes
+    the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def call(self, fn, is_failure):
+        """Run fn() through the breaker; is_failure(exc) says whether an error counts"""
+        self._before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            self._after_call(failed=is_failure(e))
+            raise
+        self._after_call(failed=False)
+        return result
+
+    def _before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError("Data backend unavailable, skipping call")
+            self._trial_in_flight = True
+
+    def _after_call(self, failed):
+        with self._lock:
+            self._trial_in_flight = False
+            if not failed:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"Data backend failed {self._failures} times in a row, opening circuit")
+                self._opened_at = time.monotonic()
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one in-flight call.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for, and share, the same result or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+class DataClient(DataSource):
+    """Wraps a data source with request coalescing and a circuit breaker.
+
+    Identical concurrent calls (many dashboards opening the same supplier at
+    once, or several suppliers falling back to halos_data) share one backend
+    query. Every call goes through the circuit breaker, so when the backend
+    is timing out requests fail fast instead of each tying up a worker for
+    the full timeout.
+    """
+
+    def __init__(self, source, breaker):
+        self.source = source
+        self.breaker = breaker
+        self.name = source.name
+        self.writable = source.writable
+        self._flights = SingleFlight()
+
+    @property
+    def coalesced(self):
+        return self._flights.shared
+
+    def iter_pages(self, table_name, columns=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE,
+                   order_by='analyzed_at', after=None, bbox=None):
+        pages = self.source.iter_pages(table_name, columns, start, end, page_size, order_by, after, bbox)
+        while True:
+            try:
+                page = self.breaker.call(lambda: next(pages), self.source.is_backend_error)
+            except StopIteration:
+                return
+            yield page
+
+    def fetch_rows(self, table_name, columns=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE, bbox=None):
+        key = ('rows', table_name, tuple(columns) if columns else None, start, end, bbox)
+        return self._flights.do(key, lambda: self.breaker.call(
+            lambda: self.source.fetch_rows(table_name, columns, start, end, page_size, bbox),
+            self.source.is_backend_error,
+        ))
+
+    def fingerprint(self, table_name, start=None, end=None):
+        key = ('fingerprint', table_name, start, end)
+        return self._flights.do(key, lambda: self.breaker.call(
+            lambda: self.source.fingerprint(table_name, start, end),
+            self.source.is_backend_error,
+        ))
+
+    def list_tables(self):
+        return self._flights.do(('tables',), lambda: self.breaker.call(
+            self.source.list_tables, self.source.is_backend_error,
+        ))
+
+    def table_stats(self, table_name):
+        key = ('stats', table_name)
+        return self._flights.do(key, lambda: self.breaker.call(
+            lambda: self.source.table_stats(table_name),
+            self.source.is_backend_error,
+        ))
+
+    def insert_rows(self, table_name, rows):
+        # Writes are never coalesced, but still fail fast while the circuit is open
+        return self.breaker.call(lambda: self.source.insert_rows(table_name, rows), self.source.is_backend_error)
+
+    def is_backend_error(self, exc):
+        return isinstance(exc, CircuitOpenError) or self.source.is_backend_error(exc)
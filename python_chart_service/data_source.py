@@ -0,0 +1,418 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+
+# Columns of every {brand}_data table (see BRAND_TABLE_SCHEMA.sql)
+BRAND_COLUMNS = [
+    'id', 'ripeness_score', 'latitude', 'longitude', 'location_description',
+    'fruit_type', 'analyzed_at', 'created_at',
+]
+
+# SQLite version of the standard brand table schema and indexes
+SQLITE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS "{table}" (
+    id TEXT PRIMARY KEY,
+    ripeness_score REAL NOT NULL,
+    latitude REAL,
+    longitude REAL,
+    location_description TEXT,
+    fruit_type TEXT,
+    analyzed_at TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS "idx_{table}_analyzed_at" ON "{table}"(analyzed_at);
+CREATE INDEX IF NOT EXISTS "idx_{table}_location" ON "{table}"(latitude, longitude);
+CREATE INDEX IF NOT EXISTS "idx_{table}_ripeness" ON "{table}"(ripeness_score);
+CREATE INDEX IF NOT EXISTS "idx_{table}_created_at" ON "{table}"(created_at);
+"""
+
+# Columns the charts and summary actually use
+CHART_COLUMNS = ['analyzed_at', 'ripeness_score']
+
+# Rows per keyset page (Supabase caps a single response at 1000 rows by default)
+DEFAULT_PAGE_SIZE = 1000
+
+_TABLE_NAME_RE = re.compile(r'^[a-z0-9_]+$')
+_BRAND_TABLE_RE = re.compile(r'^[a-z0-9_]+_data$')
+
+def check_table_name(table_name):
+    """Reject table names that don't follow the {brand}_data convention"""
+    if not _TABLE_NAME_RE.match(table_name or ''):
+        raise ValueError(f"Invalid table name: {table_name!r}")
+    return table_name
+
+def is_brand_table(table_name):
+    """Whether a table is a {brand}_data table (brand_data itself is not one)"""
+    return bool(_BRAND_TABLE_RE.match(table_name)) and table_name != 'brand_data'
+
+def _key_columns(columns, order_by='analyzed_at'):
+    """Columns to select: the requested ones plus the (order_by, id) page key"""
+    if columns is None:
+        return None
+    return list(columns) + [key for key in (order_by, 'id') if key not in columns]
+
+class DataSource:
+    """Where the chart service reads brand scan rows from.
+
+    iter_pages() yields lists of row dicts ordered by (order_by, id), with
+    timestamps as ISO strings, the same shape as a Supabase response. Rows can
+    be limited to a [start, end) window on the order_by column (analyzed_at
+    unless stated otherwise) and projected to a subset of columns. Passing
+    after=(value, id) resumes strictly after that page key, and bbox=(west,
+    south, east, north) keeps only rows located inside that box (the filter
+    runs in the backend, on idx_{table}_location). A missing table raises, so
+    callers can fall back to another table.
+    """
+
+    name = 'base'
+    # Whether insert_rows() is supported
+    writable = False
+
+    def iter_pages(self, table_name, columns=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE,
+                   order_by='analyzed_at', after=None, bbox=None):
+        raise NotImplementedError
+
+    def fetch_rows(self, table_name, columns=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE, bbox=None):
+        """Fetch every page of the window into a single list"""
+        rows = []
+        for page in self.iter_pages(table_name, columns, start, end, page_size, bbox=bbox):
+            rows.extend(page)
+        return rows
+
+    def fingerprint(self, table_name, start=None, end=None):
+        """Cheap (row count, max analyzed_at) summary of a window, used as a cache key"""
+        raise NotImplementedError
+
+    def list_tables(self):
+        """{table: columns} for every brand table, in as few calls as the backend allows"""
+        raise NotImplementedError(f"{self.name} data source can't list its tables")
+
+    def table_stats(self, table_name):
+        """(row count, earliest analyzed_at, latest analyzed_at) of a whole table"""
+        count, latest = self.fingerprint(table_name)
+        page = next(self.iter_pages(table_name, ['analyzed_at'], page_size=1), [])
+        return count, page[0]['analyzed_at'] if page else None, latest
+
+    def insert_rows(self, table_name, rows):
+        """Insert rows into a table, ignoring ids that are already present"""
+        raise NotImplementedError(f"{self.name} data source is read-only")
+
+    def is_backend_error(self, exc):
+        """Whether an error means the backend itself is failing (not e.g. a missing table)"""
+        return False
+
+class SupabaseDataSource(DataSource):
+    """Reads directly from the live Supabase project.
+
+    All requests share one pooled HTTP/2 client, so concurrent queries from
+    the request threads reuse kept-alive connections instead of reconnecting.
+    The client (and the supabase package) is only created on first use, so
+    building a source is instant and can't fail while the backend is down.
+    """
+
+    name = 'supabase'
+    writable = True
+
+    def __init__(self, url, key, timeout=10.0, max_connections=20, client=None):
+        self.url = url
+        self.key = key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        # A ready-made client, e.g. the in-memory stand-in used by benchmark.py
+        self.injected = client is not None
+        self._client = client
+        self._http = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        self._connect()
+        return self._client
+
+    @property
+    def http(self):
+        """The pooled httpx client (None for an injected client)"""
+        if self.injected:
+            return None
+        self._connect()
+        return self._http
+
+    def _connect(self):
+        """Create the pooled HTTP client and the Supabase client, once"""
+        if self._client is not None:
+            return
+        with self._lock:
+            if self._client is not None:
+                return
+            import httpx
+            from supabase import ClientOptions, create_client
+
+            self._http = httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections, keepalive_expiry=30),
+            )
+            self._client = create_client(self.url, self.key, options=ClientOptions(httpx_client=self._http))
+
+    def iter_pages(self, table_name, columns=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE,
+                   order_by='analyzed_at', after=None, bbox=None):
+        select = ",".join(_key_columns(columns, order_by)) if columns else "*"
+        last = after
+        while True:
+            query = self.client.table(table_name).select(select)
+            if start:
+                query = query.gte(order_by, start)
+            if end:
+                query = query.lt(order_by, end)
+            if bbox:
+                west, south, east, north = bbox
+                query = query.gte("latitude", south).lte("latitude", north) \
+                    .gte("longitude", west).lte("longitude", east)
+            if last:
+                # Keyset pagination on idx_{table}_{order_by}, with id breaking ties
+                value, row_id = f'"{last[0]}"', f'"{last[1]}"'
+                query = query.or_(f"{order_by}.gt.{value},and({order_by}.eq.{value},id.gt.{row_id})")
+            page = query.order(order_by).order("id").limit(page_size).execute().data
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            last = (page[-1][order_by], page[-1]["id"])
+
+    def fingerprint(self, table_name, start=None, end=None):
+        query = self.client.table(table_name).select("analyzed_at", count="exact")
+        if start:
+            query = query.gte("analyzed_at", start)
+        if end:
+            query = query.lt("analyzed_at", end)
+        response = query.order("analyzed_at", desc=True).limit(1).execute()
+        latest = response.data[0]["analyzed_at"] if response.data else None
+        return response.count or 0, latest
+
+    def list_tables(self):
+        if self.http is None:
+            raise NotImplementedError("Table listing needs the PostgREST schema endpoint")
+        # PostgREST describes every table it exposes, with its columns, in one
+        # OpenAPI document
+        response = self.http.get(f"{self.url}/rest/v1/", headers={
+            'apikey': self.key, 'Authorization': f"Bearer {self.key}", 'Accept': 'application/openapi+json',
+        })
+        response.raise_for_status()
+        definitions = response.json().get('definitions', {})
+        return {name: list(spec.get('properties', {}))
+                for name, spec in sorted(definitions.items()) if is_brand_table(name)}
+
+    def is_backend_error(self, exc):
+        import httpx
+        from postgrest.exceptions import APIError
+
+        if isinstance(exc, httpx.TransportError):
+            return True
+        # Connection, resource and statement-timeout SQLSTATE classes; a missing
+        # table (42P01) or bad filter is the caller's problem, not the backend's
+        return isinstance(exc, APIError) and str(exc.code or '').startswith(('08', '53', '57'))
+
+    def insert_rows(self, table_name, rows):
+        """Insert rows, skipping any whose id already exists (safe to retry)"""
+        self.client.table(table_name).upsert(
+            rows, on_conflict='id', ignore_duplicates=True, returning='minimal'
+        ).execute()
+
+class SQLiteDataSource(DataSource):
+    """Reads from a local SQLite replica with one table per brand"""
+
+    name = 'sqlite'
+    writable = True
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def iter_pages(self, table_name, columns=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE,
+                   order_by='analyzed_at', after=None, bbox=None):
+        check_table_name(table_name)
+        check_table_name(order_by)
+        select = ", ".join(_key_columns(columns, order_by)) if columns else "*"
+        window, params = [], []
+        if start:
+            window.append(f"{order_by} >= ?")
+            params.append(start)
+        if end:
+            window.append(f"{order_by} < ?")
+            params.append(end)
+        if bbox:
+            west, south, east, north = bbox
+            window.append("latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?")
+            params += [south, north, west, east]
+        with closing(self.connect()) as conn:
+            last = after
+            while True:
+                clauses, args = list(window), list(params)
+                if last:
+                    clauses.append(f"({order_by} > ? OR ({order_by} = ? AND id > ?))")
+                    args += [last[0], last[0], last[1]]
+                where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+                page = [dict(row) for row in conn.execute(
+                    f'SELECT {select} FROM "{table_name}" {where} ORDER BY {order_by}, id LIMIT ?',
+                    args + [page_size],
+                )]
+                if page:
+                    yield page
+                if len(page) < page_size:
+                    return
+                last = (page[-1][order_by], page[-1]["id"])
+
+    def fingerprint(self, table_name, start=None, end=None):
+        check_table_name(table_name)
+        clauses, args = [], []
+        if start:
+            clauses.append("analyzed_at >= ?")
+            args.append(start)
+        if end:
+            clauses.append("analyzed_at < ?")
+            args.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self.connect()) as conn:
+            count, latest = conn.execute(
+                f'SELECT COUNT(*), MAX(analyzed_at) FROM "{table_name}" {where}', args
+            ).fetchone()
+        return count, latest
+
+    def list_tables(self):
+        with closing(self.connect()) as conn:
+            names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+            return {name: [column['name'] for column in conn.execute(f'PRAGMA table_info("{name}")')]
+                    for name in names if is_brand_table(name)}
+
+    def table_stats(self, table_name):
+        check_table_name(table_name)
+        with closing(self.connect()) as conn:
+            return tuple(conn.execute(
+                f'SELECT COUNT(*), MIN(analyzed_at), MAX(analyzed_at) FROM "{table_name}"'
+            ).fetchone())
+
+    def is_backend_error(self, exc):
+        return isinstance(exc, sqlite3.OperationalError) and 'locked' in str(exc)
+
+    def replace_rows(self, table_name, rows):
+        """Replace the local copy of a table with the given rows"""
+        check_table_name(table_name)
+        with closing(self.connect()) as conn, conn:
+            conn.executescript(SQLITE_TABLE_SQL.format(table=table_name))
+            conn.execute(f'DELETE FROM "{table_name}"')
+            self._insert(conn, table_name, rows)
+
+    def insert_rows(self, table_name, rows):
+        """Insert rows, skipping any whose id already exists (safe to retry).
+
+        Like the Supabase column default, rows without a created_at are
+        stamped with the time of the insert. The stamp is taken once the
+        write lock is held, so it follows commit order.
+        """
+        check_table_name(table_name)
+        with closing(self.connect()) as conn, conn:
+            conn.executescript(SQLITE_TABLE_SQL.format(table=table_name))
+            conn.execute("BEGIN IMMEDIATE")
+            created_at = datetime.now(timezone.utc).isoformat(timespec='microseconds')
+            rows = [row if row.get('created_at') else dict(row, created_at=created_at) for row in rows]
+            self._insert(conn, table_name, rows, 'INSERT OR IGNORE')
+
+    def _insert(self, conn, table_name, rows, verb='INSERT'):
+        conn.executemany(
+            f'{verb} INTO "{table_name}" ({", ".join(BRAND_COLUMNS)}) '
+            f'VALUES ({", ".join("?" * len(BRAND_COLUMNS))})',
+            [tuple(row.get(column) for column in BRAND_COLUMNS) for row in rows],
+        )
+
+class ParquetDataSource(DataSource):
+    """Reads from a directory holding one {table}.parquet file per brand"""
+
+    name = 'parquet'
+
+    def __init__(self, path):
+        self.path = path
+
+    def table_path(self, table_name):
+        return os.path.join(self.path, f"{check_table_name(table_name)}.parquet")
+
+    def read_window(self, table_name, columns=None, start=None, end=None, order_by='analyzed_at', after=None,
+                    bbox=None):
+        """Load the [start, end) window of a table, sorted by (order_by, id)"""
+        import pandas as pd
+
+        # Parquet is columnar, so projection happens at read time, and the
+        # bounding box is pushed down to row-group statistics; the window is
+        # applied in memory
+        filters = None
+        if bbox:
+            west, south, east, north = bbox
+            filters = [('latitude', '>=', south), ('latitude', '<=', north),
+                       ('longitude', '>=', west), ('longitude', '<=', east)]
+        df = pd.read_parquet(self.table_path(table_name), columns=_key_columns(columns, order_by), filters=filters)
+        # Match the Supabase row shape: ISO timestamp strings
+        for column in ('analyzed_at', 'created_at'):
+            if column in df and pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = df[column].map(lambda ts: ts.isoformat() if not pd.isna(ts) else None)
+        df = df[df[order_by].notna()]
+        if start:
+            df = df[df[order_by] >= start]
+        if end:
+            df = df[df[order_by] < end]
+        if after:
+            df = df[(df[order_by] > after[0]) | ((df[order_by] == after[0]) & (df['id'] > after[1]))]
+        return df.sort_values([order_by, 'id'], kind='stable')
+
+    def iter_pages(self, table_name, columns=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE,
+                   order_by='analyzed_at', after=None, bbox=None):
+        df = self.read_window(table_name, columns, start, end, order_by, after, bbox)
+        df = df.astype(object).where(df.notna(), None)
+        for offset in range(0, len(df), page_size):
+            yield df.iloc[offset:offset + page_size].to_dict('records')
+
+    def fingerprint(self, table_name, start=None, end=None):
+        df = self.read_window(table_name, ['analyzed_at'], start, end)
+        return len(df), (df['analyzed_at'].iloc[-1] if len(df) else None)
+
+    def list_tables(self):
+        import pyarrow.parquet as pq
+
+        tables = {}
+        for entry in sorted(os.listdir(self.path)) if os.path.isdir(self.path) else []:
+            name, extension = os.path.splitext(entry)
+            if extension == '.parquet' and is_brand_table(name):
+                # Only the file footer is read
+                tables[name] = pq.read_schema(os.path.join(self.path, entry)).names
+        return tables
+
+    def table_stats(self, table_name):
+        df = self.read_window(table_name, ['analyzed_at'])
+        if not len(df):
+            return 0, None, None
+        return len(df), df['analyzed_at'].iloc[0], df['analyzed_at'].iloc[-1]
+
+    def replace_rows(self, table_name, rows):
+        """Replace the local copy of a table with the given rows"""
+        import pandas as pd
+
+        os.makedirs(self.path, exist_ok=True)
+        df = pd.DataFrame(rows, columns=BRAND_COLUMNS)
+        df.to_parquet(self.table_path(table_name), index=False)
+
+def create_data_source(kind, supabase_url=None, supabase_key=None, local_path=None, **supabase_options):
+    """Build the data source selected by config (supabase, sqlite or parquet)"""
+    if kind == 'supabase':
+        return SupabaseDataSource(supabase_url, supabase_key, **supabase_options)
+    if kind == 'sqlite':
+        return SQLiteDataSource(local_path)
+    if kind == 'parquet':
+        return ParquetDataSource(local_path)
+    raise ValueError(f"Unknown data source: {kind!r}")
@@ -0,0 +1,134 @@
+import io
+import zlib
+
+import pandas as pd
+
+from data_source import BRAND_COLUMNS
+from scan_frame import shelf_life_days
+
+# Export formats and their content types
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Columns of an export: the brand table's, plus the shelf-life estimate and
+# UTC day derived from each scan
+EXPORT_COLUMNS = BRAND_COLUMNS + ['shelf_life_days', 'day']
+
+# Rows per Parquet row group; pages are buffered up to this many rows, which
+# bounds the memory an export holds at once
+PARQUET_ROW_GROUP_ROWS = 50_000
+
+def export_frame(page):
+    """A page of rows as a frame with the derived columns, computed for the whole page at once"""
+    frame = pd.DataFrame.from_records(page, columns=BRAND_COLUMNS)
+    for column in ('ripeness_score', 'latitude', 'longitude'):
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(float)
+    scores = frame['ripeness_score']
+    shelf_life = pd.Series(shelf_life_days(scores.fillna(0).to_numpy()), index=frame.index)
+    frame['shelf_life_days'] = shelf_life.where(scores.notna())
+    analyzed_at = pd.to_datetime(frame['analyzed_at'], utc=True, errors='coerce', format='ISO8601')
+    # Truncating datetime64 to days is much faster than strftime
+    days = analyzed_at.dt.tz_convert(None).to_numpy().astype('datetime64[D]').astype(str)
+    frame['day'] = pd.Series(days, index=frame.index).where(analyzed_at.notna())
+    return frame
+
+def csv_chunks(frames):
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header).encode()
+        header = False
+    if header:
+        # No rows: still a valid CSV with its header
+        yield pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(index=False).encode()
+
+def ndjson_chunks(frames):
+    for frame in frames:
+        if not frame.empty:
+            lines = frame.to_json(orient='records', lines=True, date_format='iso')
+            yield (lines if lines.endswith('\n') else lines + '\n').encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('id', pa.string()),
+        ('ripeness_score', pa.float64()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('location_description', pa.string()),
+        ('fruit_type', pa.string()),
+        ('analyzed_at', pa.timestamp('us', tz='UTC')),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('shelf_life_days', pa.float64()),
+        ('day', pa.date32()),
+    ])
+
+def parquet_chunks(frames):
+    """Parquet file written one row group at a time; each group is sent as soon as it's written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    buffered, rows = [], 0
+
+    def row_group():
+        frame = pd.concat(buffered, ignore_index=True)
+        for column in ('analyzed_at', 'created_at'):
+            frame[column] = pd.to_datetime(frame[column], utc=True, errors='coerce', format='ISO8601')
+        frame['day'] = pd.to_datetime(frame['day'])
+        return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+    with pq.ParquetWriter(sink, schema) as writer:
+        for frame in frames:
+            buffered.append(frame)
+            rows += len(frame)
+            if rows >= PARQUET_ROW_GROUP_ROWS:
+                writer.write_table(row_group())
+                buffered, rows = [], 0
+                yield sink.drain()
+        if rows:
+            writer.write_table(row_group())
+    yield sink.drain()
+
+WRITERS = {'csv': csv_chunks, 'ndjson': ndjson_chunks, 'parquet': parquet_chunks}
+
+def gzip_chunks(chunks):
+    """Gzip a byte stream as it is produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_chunks(pages, fmt, gzip=False):
+    """Encode pages of table rows as fmt, a page at a time; yields bytes"""
+    chunks = WRITERS[fmt](export_frame(page) for page in pages)
+    return gzip_chunks(chunks) if gzip else chunks
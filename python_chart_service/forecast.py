@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from scan_frame import SHELF_LIFE_BUCKETS, SHELF_LIFE_DAYS
+
+# Bumped when the fitted model layout changes; cached models of another
+# version are refit
+MODEL_VERSION = 1
+
+# Days of daily rollups (ending at the latest scan) a model is fitted on
+FORECAST_HISTORY_DAYS = 90
+
+# Smoothing factors tried for level and trend; the pair with the lowest
+# one-step-ahead squared error over the history is kept
+SMOOTHING_GRID = np.linspace(0.1, 0.9, 9)
+
+# Trend damping: each further day ahead adds PHI times the previous day's
+# trend, so projections level off instead of running off the 0-15 scale
+TREND_DAMPING = 0.9
+
+# Whole days until a scan in each band expires (shelf life rounded half up),
+# so scans from the last EXPIRY_LOOKBACK days may still be in stock
+EXPIRY_DAYS = np.floor(SHELF_LIFE_DAYS + 0.5).astype(int)
+EXPIRY_LOOKBACK = int(EXPIRY_DAYS.max())
+
+def smooth(values, observed, alphas, betas, phi=TREND_DAMPING):
+    """Damped Holt smoothing of each column of values (days x series), once per (alpha, beta) pair.
+
+    Vectorized over the pairs: returns the sum of squared one-step-ahead
+    errors, final level and final trend of every pair. Days that are not
+    observed (no scans) advance the forecast without updating it.
+    """
+    a, b = alphas[:, None], betas[:, None]
+    level = np.repeat(values[:1], len(alphas), axis=0)
+    trend = np.zeros_like(level)
+    errors = np.zeros(len(alphas))
+    for value, seen in zip(values[1:], observed[1:]):
+        predicted = level + phi * trend
+        if not seen:
+            level, trend = predicted, phi * trend
+            continue
+        errors += ((value - predicted) ** 2).sum(axis=1)
+        new_level = a * value + (1 - a) * predicted
+        trend = b * (new_level - level) + (1 - b) * phi * trend
+        level = new_level
+    return errors, level, trend
+
+def fit_component(values, observed, trend=True):
+    """Best smoothing parameters and final state for the columns of values"""
+    if trend:
+        alphas, betas = (grid.ravel() for grid in np.meshgrid(SMOOTHING_GRID, SMOOTHING_GRID))
+    else:
+        alphas, betas = SMOOTHING_GRID, np.zeros_like(SMOOTHING_GRID)
+    errors, level, trends = smooth(values, observed, alphas, betas)
+    best = int(np.argmin(errors))
+    return {
+        'alpha': float(alphas[best]),
+        'beta': float(betas[best]),
+        'level': level[best].tolist(),
+        'trend': trends[best].tolist(),
+        'rmse': float(np.sqrt(errors[best] / max(int(observed[1:].sum()) * values.shape[1], 1))),
+    }
+
+def fit_model(daily):
+    """Fit a forecast model to a table's daily rollups (see AggregateStore.daily).
+
+    Three damped exponential smoothing components are fitted on the last
+    FORECAST_HISTORY_DAYS calendar days: the daily mean ripeness, the share
+    of scans in each shelf-life band, and (without a trend) the daily scan
+    count. The model is a JSON-friendly dict of the final smoothed states,
+    plus the band counts of the last EXPIRY_LOOKBACK days, which are still
+    in stock when the forecast starts.
+    """
+    last_day = daily.index[-1]
+    daily = daily[daily.index > last_day - pd.Timedelta(days=FORECAST_HISTORY_DAYS)]
+    daily = daily.reindex(pd.date_range(daily.index[0], last_day, freq='D'))
+    counts = daily['count'].fillna(0).to_numpy()
+    observed = counts > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (daily['sum'].to_numpy() / counts)[:, None]
+        shares = daily[SHELF_LIFE_BUCKETS].to_numpy(dtype=float) / counts[:, None]
+
+    recent = daily[SHELF_LIFE_BUCKETS].fillna(0).iloc[-EXPIRY_LOOKBACK:]
+    return {
+        'version': MODEL_VERSION,
+        'last_day': last_day.strftime('%Y-%m-%d'),
+        'history_days': len(daily),
+        'ripeness': fit_component(means, observed),
+        'shares': fit_component(shares, observed),
+        'volume': fit_component(counts[:, None], np.ones(len(counts), dtype=bool), trend=False),
+        'recent': {day.strftime('%Y-%m-%d'): row.astype(int).tolist() for day, row in recent.iterrows()},
+    }
+
+def project(component, steps, phi=TREND_DAMPING):
+    """Damped trend projection of a component for each number of days ahead (steps x series)"""
+    # Sum of phi^1..phi^h for each horizon h
+    damping = np.cumsum(phi ** np.arange(1, steps.max() + 1))[steps - 1]
+    return np.asarray(component['level']) + damping[:, None] * np.asarray(component['trend'])
+
+def forecast(model, days, start=None):
+    """Expected scans, ripeness, shelf life and expiring volume for `days` days from start.
+
+    start (a UTC day, default the day after the model's last day) may be
+    later than the last day; the days in between are projected too, so
+    scans expected to arrive in that gap still count toward the expiry
+    curve. A scan expires EXPIRY_DAYS days after the day it arrives, by band.
+    """
+    last_day = pd.Timestamp(model['last_day'], tz='UTC')
+    first = last_day + pd.Timedelta(days=1)
+    start = max(first, start or first)
+    calendar = pd.date_range(first, start + pd.Timedelta(days=days - 1), freq='D')
+    steps = np.arange(1, len(calendar) + 1)
+
+    volume = np.clip(project(model['volume'], steps)[:, 0], 0, None)
+    ripeness = np.clip(project(model['ripeness'], steps)[:, 0], 0, 15)
+    shares = np.clip(project(model['shares'], steps), 0, None)
+    shares = shares / np.where(shares.sum(axis=1) > 0, shares.sum(axis=1), 1)[:, None]
+
+    # Expected units of each band arriving per day: the last days' actual
+    # counts, then the projection; each lands on its expiry day
+    arrivals = [(pd.Timestamp(day, tz='UTC'), np.asarray(counts, dtype=float))
+                for day, counts in model['recent'].items()]
+    arrivals += zip(calendar, volume[:, None] * shares)
+    expiring = pd.Series(0.0, index=calendar)
+    for day, counts in arrivals:
+        for expiry_days, count in zip(EXPIRY_DAYS, counts):
+            expiry = day + pd.Timedelta(days=int(expiry_days))
+            if expiry in expiring.index:
+                expiring[expiry] += count
+
+    frame = pd.DataFrame({
+        'expected_scans': volume,
+        'average_ripeness': ripeness,
+        'expected_shelf_life': shares @ SHELF_LIFE_DAYS,
+        'expiring': expiring.to_numpy(),
+    }, index=calendar)
+    for bucket, column in zip(SHELF_LIFE_BUCKETS, shares.T):
+        frame[f'{bucket}_share'] = column
+    frame = frame[frame.index >= start]
+    frame['cumulative_expiring'] = frame['expiring'].cumsum()
+    return frame
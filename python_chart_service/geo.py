@@ -0,0 +1,142 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from scan_frame import shelf_life_bucket
+
+# Side of the base grid cell in degrees (~1.1 km of latitude); rollups are
+# stored at this size and coarser grids are sums of whole base cells
+GEO_BASE_CELL = 0.01
+
+# Cell sizes a map may ask for, all whole multiples of the base cell
+GEO_CELL_SIZES = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0]
+
+# Most cells a single request may cover (bbox area / cell area)
+GEO_MAX_CELLS = 250_000
+
+# Columns needed to bin scans
+GEO_COLUMNS = ['analyzed_at', 'ripeness_score', 'latitude', 'longitude']
+
+# Heatmap data: per-cell averages (see cell_summary) over a cell-aligned bbox
+GeoGrid = namedtuple('GeoGrid', ['cells', 'bbox', 'size'])
+
+def parse_bbox(value):
+    """Parse a 'west,south,east,north' bounding box in degrees"""
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        raise ValueError("'bbox' must be west,south,east,north in degrees")
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+        raise ValueError("'bbox' must have west < east within ±180 and south < north within ±90")
+    return west, south, east, north
+
+def parse_cell_size(value, bbox):
+    """Read a cell size in degrees, defaulting to the finest that fits GEO_MAX_CELLS"""
+    west, south, east, north = bbox
+    sizes = GEO_CELL_SIZES
+    if value:
+        try:
+            size = float(value)
+        except ValueError:
+            size = None
+        if size not in GEO_CELL_SIZES:
+            raise ValueError(f"'cell' must be one of {', '.join(map(str, GEO_CELL_SIZES))}")
+        sizes = [size]
+    for size in sizes:
+        if (east - west) / size * (north - south) / size <= GEO_MAX_CELLS:
+            return size
+    raise ValueError(f"Too many cells: the bbox would cover more than {GEO_MAX_CELLS} cells")
+
+def cell_index(values, size=GEO_BASE_CELL):
+    """Grid cell number of each coordinate (floor of degrees / size)"""
+    # The nudge keeps values on a cell edge (34.05 / 0.01 = 3404.9999...) in that cell
+    return np.floor(np.asarray(values, dtype=float) / size + 1e-9).astype(np.int64)
+
+def cell_ceiling(values, size=GEO_BASE_CELL):
+    """Number of the first cell edge at or above each coordinate"""
+    # Same nudge as cell_index, so a value on an edge stays on it
+    return np.ceil(np.asarray(values, dtype=float) / size - 1e-9).astype(np.int64)
+
+def snap_bbox(bbox, size):
+    """Grow a bbox outward to whole cells, so edge cells hold all of their scans"""
+    west, south, east, north = bbox
+    return (
+        round(float(cell_index(west, size)) * size, 6),
+        round(float(cell_index(south, size)) * size, 6),
+        round(float(cell_ceiling(east, size)) * size, 6),
+        round(float(cell_ceiling(north, size)) * size, 6),
+    )
+
+def bin_scans(rows, size=GEO_BASE_CELL, by_day=False):
+    """Count, ripeness sum and very-ripe count per grid cell (and per UTC day).
+
+    Vectorized over the whole batch: coordinates become integer cell numbers
+    and the rows are grouped on them in one pass. Rows without a location or
+    score are skipped.
+    """
+    raw = pd.DataFrame.from_records(rows, columns=GEO_COLUMNS)
+    frame = pd.DataFrame({
+        'ripeness_score': pd.to_numeric(raw['ripeness_score'], errors='coerce'),
+        'latitude': pd.to_numeric(raw['latitude'], errors='coerce'),
+        'longitude': pd.to_numeric(raw['longitude'], errors='coerce'),
+    })
+    keys = ['lat_cell', 'lng_cell']
+    if by_day:
+        analyzed_at = pd.to_datetime(raw['analyzed_at'], utc=True, errors='coerce', format='ISO8601')
+        frame['day'] = analyzed_at.dt.strftime('%Y-%m-%d')
+        keys = ['day'] + keys
+    frame = frame.dropna()
+    frame = frame.assign(
+        lat_cell=cell_index(frame['latitude'], size),
+        lng_cell=cell_index(frame['longitude'], size),
+        very_ripe=shelf_life_bucket(frame['ripeness_score'].to_numpy()) == 0,
+    )
+    return frame.groupby(keys, as_index=False).agg(
+        count=('ripeness_score', 'size'),
+        sum=('ripeness_score', 'sum'),
+        very_ripe=('very_ripe', 'sum'),
+    )
+
+def coarsen_cells(cells, factor):
+    """Merge base cells into cells `factor` times larger"""
+    if factor == 1:
+        return cells
+    return cells.assign(
+        lat_cell=cells['lat_cell'] // factor,
+        lng_cell=cells['lng_cell'] // factor,
+    ).groupby(['lat_cell', 'lng_cell'], as_index=False)[['count', 'sum', 'very_ripe']].sum()
+
+def geo_grid(base_cells, bbox, size):
+    """GeoGrid of size-degree cells inside a cell-aligned bbox, from base cell totals"""
+    cells = coarsen_cells(base_cells, round(size / GEO_BASE_CELL))
+    west, south, east, north = bbox
+    inside = (
+        (cells['lat_cell'] >= cell_index(south, size)) & (cells['lat_cell'] < cell_index(north, size))
+        & (cells['lng_cell'] >= cell_index(west, size)) & (cells['lng_cell'] < cell_index(east, size))
+    )
+    return GeoGrid(cell_summary(cells[inside], size), bbox, size)
+
+def cell_summary(cells, size):
+    """Per-cell averages with each cell's bounds, sorted by cell"""
+    cells = cells.sort_values(['lat_cell', 'lng_cell']).reset_index(drop=True)
+    return pd.DataFrame({
+        'south': (cells['lat_cell'] * size).round(6),
+        'west': (cells['lng_cell'] * size).round(6),
+        'north': ((cells['lat_cell'] + 1) * size).round(6),
+        'east': ((cells['lng_cell'] + 1) * size).round(6),
+        'count': cells['count'].astype(int),
+        'average_ripeness': cells['sum'] / cells['count'],
+        'very_ripe_share': cells['very_ripe'] / cells['count'],
+    })
+
+def grid_values(grid, column='average_ripeness'):
+    """(longitude edges, latitude edges, 2D values with NaN for empty cells) of a GeoGrid"""
+    west, south, east, north = grid.bbox
+    columns = int(round((east - west) / grid.size))
+    rows = int(round((north - south) / grid.size))
+    values = np.full((rows, columns), np.nan)
+    row = np.rint((grid.cells['south'].to_numpy() - south) / grid.size).astype(int)
+    col = np.rint((grid.cells['west'].to_numpy() - west) / grid.size).astype(int)
+    values[row, col] = grid.cells[column].to_numpy()
+    return np.linspace(west, east, columns + 1), np.linspace(south, north, rows + 1), values
@@ -0,0 +1,31 @@
+# Production server for the chart service:
+#   gunicorn -c gunicorn.conf.py chart_generator:app
+#
+# Each gunicorn worker handles requests on a few threads and hands chart
+# rendering to its own pool of render processes (CHART_RENDER_WORKERS), so
+# a slow render never blocks the request threads. Each worker also tracks
+# its own most requested charts and pre-renders them in the background; set
+# CHART_CACHE_DIR so workers share those renders through the disk cache.
+#
+# A worker answers /health as soon as it is forked; heavy modules, the rollup
+# store and the render processes are loaded in the background, and /ready
+# returns 503 until they are, so point the load balancer's readiness probe there.
+import os
+
+bind = os.environ.get('CHART_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('CHART_HTTP_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('CHART_HTTP_THREADS', 8))
+timeout = int(os.environ.get('CHART_HTTP_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+def post_worker_init(worker):
+    """Start preloading (render processes included) in the background, and start pre-rendering"""
+    from chart_generator import start_background_work
+    start_background_work()
+
+def worker_exit(server, worker):
+    from chart_generator import stop_background_work
+    stop_background_work()
@@ -0,0 +1,359 @@
+import fcntl
+import json
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from data_source import BRAND_COLUMNS
+
+# Lat/lng bounds and the ripeness scale a scan record must fall within
+# (BRAND_TABLE_SCHEMA.sql stores them as DECIMAL(10,8), (11,8) and (5,2))
+LATITUDE_RANGE = (-90, 90)
+LONGITUDE_RANGE = (-180, 180)
+RIPENESS_RANGE = (0, 15)
+
+# Longest text accepted for the free-text columns
+MAX_TEXT_LENGTH = 500
+
+# Subdirectory of the spool that rows the data source rejects are moved to
+DEAD_LETTER_DIR = 'dead-letter'
+
+class QueueFull(Exception):
+    """The write-behind queue holds as many rows as it may; the client should retry"""
+
+def _number(record, column, bounds, required=False):
+    value = record.get(column)
+    if value is None:
+        if required:
+            raise ValueError(f"'{column}' is required")
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"'{column}' must be a number")
+    if not bounds[0] <= value <= bounds[1]:
+        raise ValueError(f"'{column}' must be between {bounds[0]} and {bounds[1]}")
+    return float(value)
+
+def _text(record, column):
+    value = record.get(column)
+    if value is None:
+        return None
+    if not isinstance(value, str) or len(value) > MAX_TEXT_LENGTH:
+        raise ValueError(f"'{column}' must be a string of at most {MAX_TEXT_LENGTH} characters")
+    return value
+
+def validate_record(record):
+    """A scan record as a brand table row, checked against the BRAND_TABLE_SCHEMA.sql columns.
+
+    ripeness_score and analyzed_at (ISO 8601, UTC if no offset) are required.
+    A record without an id is given one now, so re-sending the row after a
+    crash can't insert it twice. created_at is left to the data source,
+    which stamps it when the row is written.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("A scan record must be a JSON object")
+    unknown = sorted(set(record) - set(BRAND_COLUMNS))
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    if 'created_at' in record:
+        raise ValueError("'created_at' is set by the service")
+
+    row_id = record.get('id') or str(uuid.uuid4())
+    try:
+        row_id = str(uuid.UUID(str(row_id)))
+    except ValueError:
+        raise ValueError("'id' must be a UUID")
+
+    analyzed_at = record.get('analyzed_at')
+    if not isinstance(analyzed_at, str):
+        raise ValueError("'analyzed_at' is required (an ISO 8601 timestamp)")
+    try:
+        parsed = datetime.fromisoformat(analyzed_at.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid 'analyzed_at' timestamp: {analyzed_at}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    score = _number(record, 'ripeness_score', RIPENESS_RANGE, required=True)
+    return {
+        'id': row_id,
+        'ripeness_score': round(score, 2),
+        'latitude': _number(record, 'latitude', LATITUDE_RANGE),
+        'longitude': _number(record, 'longitude', LONGITUDE_RANGE),
+        'location_description': _text(record, 'location_description'),
+        'fruit_type': _text(record, 'fruit_type'),
+        # Microseconds always shown, so the watermarks compare as strings
+        'analyzed_at': parsed.astimezone(timezone.utc).isoformat(timespec='microseconds'),
+    }
+
+class WriteBehindQueue:
+    """Buffers accepted scan rows and writes them to the data source in bulk.
+
+    submit() appends the rows to a spool file (and fsyncs it) before they
+    are buffered, so once a request is answered its rows survive a crash.
+    A background thread flushes every table's rows with insert_rows() once
+    batch_size rows are waiting or the oldest has waited flush_interval
+    seconds. Tables are flushed independently: when the backend fails, that
+    table's rows are kept and retried with backoff, and rows rejected for
+    any other reason are moved to the dead-letter directory.
+    Delivery is at least once: spool segments are deleted only once every
+    row in them is written, dead-lettered or spooled again, and a restart
+    replays what is left (inserts ignore ids already present).
+
+    Each process spools into its own directory, held with a lock while it
+    runs; on start a process adopts the segments of any directory whose
+    owner is gone. At most max_queued rows are buffered or in flight, after
+    which submit() raises QueueFull. After each flush the latest analyzed_at
+    written to each table is kept in `watermarks` and on_flush(table, latest)
+    is called, so cached charts can be invalidated.
+    """
+
+    def __init__(self, data_source, spool_dir, batch_size=500, flush_interval=2.0, max_queued=50_000,
+                 on_flush=lambda table, latest: None, max_backoff=60.0):
+        self.data_source = data_source
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.on_flush = on_flush
+        self.max_backoff = max_backoff
+        self.watermarks = {}  # table -> latest analyzed_at written
+        self.counts = {'accepted': 0, 'flushed': 0, 'failed_flushes': 0, 'dead_lettered': 0}
+        self._buffer = {}  # table -> rows waiting for the next flush
+        self._queued = 0  # rows buffered or being flushed
+        self._oldest = None  # when the oldest buffered row arrived
+        self._segments = []  # closed spool segments whose rows are buffered or being flushed
+        self._spool = None
+        self._sequence = 0
+        self._dir = None
+        self._owner_lock = None
+        self._lock = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def queued(self):
+        return self._queued
+
+    def start(self):
+        """Open this process's spool, replay what earlier processes left, and start flushing"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._open_spool()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='scan-ingest', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher after a last flush; rows that couldn't be written stay spooled"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        with self._lock:
+            self._lock.notify_all()
+        self._thread.join()
+        self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️  Final ingest flush failed, {self._queued} rows stay spooled: {e}")
+        with self._lock:
+            self._spool.close()
+            self._spool = None
+            if not self._queued:
+                shutil.rmtree(self._dir, ignore_errors=True)
+            # Releasing the lock lets the next process adopt anything left
+            self._owner_lock.close()
+
+    def submit(self, table_name, rows):
+        """Spool and buffer validated rows for a table; raises QueueFull when the queue is full"""
+        self.start()
+        lines = ''.join(json.dumps({'table': table_name, 'row': row}) + '\n' for row in rows)
+        with self._lock:
+            if self._queued + len(rows) > self.max_queued:
+                raise QueueFull(f"Ingest queue is full ({self._queued} rows waiting)")
+            self._spool.write(lines)
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+            self._buffer.setdefault(table_name, []).extend(rows)
+            self._queued += len(rows)
+            self.counts['accepted'] += len(rows)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._buffered() >= self.batch_size:
+                self._lock.notify_all()
+
+    def flush(self):
+        """Write every buffered row now; returns rows written.
+
+        Each table is written on its own. A table the backend fails on
+        (data_source.is_backend_error) keeps its rows for the next flush, and
+        the error is raised once the other tables are written; rows rejected
+        for any other reason would fail again on every retry, so they are
+        moved to the dead-letter directory instead.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._buffer
+                if not batch:
+                    return 0
+                # Rows arriving from now on go to a new segment, so the
+                # current ones can be deleted once this batch is settled
+                segments = self._segments + [self._rotate()]
+                self._buffer, self._segments, self._oldest = {}, [], None
+
+            written, retry, error = {}, {}, None
+            for table_name, rows in batch.items():
+                try:
+                    for i in range(0, len(rows), self.batch_size):
+                        self.data_source.insert_rows(table_name, rows[i:i + self.batch_size])
+                except Exception as e:
+                    if self.data_source.is_backend_error(e):
+                        # Chunks already written are re-sent as no-ops
+                        retry[table_name] = rows
+                        error = error or e
+                    else:
+                        self._dead_letter(table_name, rows, e)
+                    continue
+                written[table_name] = rows
+
+            with self._lock:
+                if retry:
+                    # The kept rows move to a segment of their own, so the
+                    # batch's segments can go
+                    self._respool(retry)
+                    for table_name, rows in retry.items():
+                        self._buffer.setdefault(table_name, [])[:0] = rows
+                    self._oldest = self._oldest or time.monotonic()
+                    self.counts['failed_flushes'] += 1
+            for segment in segments:
+                os.remove(segment)
+
+            count = sum(len(rows) for rows in written.values())
+            latest = {table_name: max(row['analyzed_at'] for row in rows) for table_name, rows in written.items()}
+            with self._lock:
+                self._queued -= sum(len(rows) for table_name, rows in batch.items() if table_name not in retry)
+                self.counts['flushed'] += count
+                for table_name, analyzed_at in latest.items():
+                    self.watermarks[table_name] = max(self.watermarks.get(table_name, ''), analyzed_at)
+            for table_name, analyzed_at in latest.items():
+                self.on_flush(table_name, analyzed_at)
+            if error is not None:
+                raise error
+            return count
+
+    def _respool(self, rows_by_table):
+        """Write rows back to a fresh segment, ahead of the other spooled ones"""
+        segment = self._next_segment()
+        with open(segment, 'w') as f:
+            for table_name, rows in rows_by_table.items():
+                f.writelines(json.dumps({'table': table_name, 'row': row}) + '\n' for row in rows)
+            f.flush()
+            os.fsync(f.fileno())
+        self._segments.insert(0, segment)
+
+    def _dead_letter(self, table_name, rows, error):
+        """Set aside rows the data source rejected, in a file of their own under the dead-letter directory"""
+        path = os.path.join(self.spool_dir, DEAD_LETTER_DIR,
+                            f"{table_name}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.jsonl")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.writelines(json.dumps(row) + '\n' for row in rows)
+                f.flush()
+                os.fsync(f.fileno())
+            print(f"❌ {table_name} rejected {len(rows)} ingested rows ({error}); moved to {path}")
+        except OSError as e:
+            print(f"❌ {table_name} rejected {len(rows)} ingested rows ({error}) and they couldn't be kept ({e}); dropped")
+        with self._lock:
+            self.counts['dead_lettered'] += len(rows)
+
+    def _run(self):
+        backoff = self.flush_interval
+        while not self._stop.is_set():
+            with self._lock:
+                # Sleep until a batch is full or the oldest row is due
+                while not self._stop.is_set() and not self._due():
+                    timeout = None if self._oldest is None else \
+                        self._oldest + self.flush_interval - time.monotonic()
+                    self._lock.wait(timeout)
+            if self._stop.is_set():
+                return
+            try:
+                self.flush()
+                backoff = self.flush_interval
+            except Exception as e:
+                print(f"⚠️  Ingest flush failed ({e}), {self._queued} rows kept, retrying in {backoff:.1f}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _due(self):
+        if self._oldest is None:
+            return False
+        return self._buffered() >= self.batch_size or time.monotonic() - self._oldest >= self.flush_interval
+
+    def _buffered(self):
+        return sum(len(rows) for rows in self._buffer.values())
+
+    def _open_spool(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._dir = os.path.join(self.spool_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(self._dir)
+        self._owner_lock = open(os.path.join(self._dir, 'owner.lock'), 'w')
+        fcntl.flock(self._owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        replayed = self._adopt_orphans()
+        self._spool = open(self._next_segment(), 'a')
+        if replayed:
+            print(f"Replaying {replayed} spooled scan rows")
+
+    def _adopt_orphans(self):
+        """Take over the segments of spool directories whose process has exited; returns rows replayed"""
+        replayed = 0
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, name)
+            if path == self._dir or name == DEAD_LETTER_DIR or not os.path.isdir(path):
+                continue
+            try:
+                with open(os.path.join(path, 'owner.lock'), 'a') as owner:
+                    fcntl.flock(owner, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    for segment in sorted(f for f in os.listdir(path) if f.endswith('.jsonl')):
+                        adopted = self._next_segment()
+                        os.replace(os.path.join(path, segment), adopted)
+                        replayed += self._replay(adopted)
+            except BlockingIOError:
+                continue  # Still owned by a running process
+            shutil.rmtree(path, ignore_errors=True)
+        return replayed
+
+    def _replay(self, segment):
+        """Buffer the rows of an adopted segment, skipping a line cut short by a crash"""
+        count = 0
+        with open(segment) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._buffer.setdefault(entry['table'], []).append(entry['row'])
+                count += 1
+        self._segments.append(segment)
+        self._queued += count
+        if count and self._oldest is None:
+            self._oldest = time.monotonic()
+        return count
+
+    def _next_segment(self):
+        self._sequence += 1
+        return os.path.join(self._dir, f"{self._sequence:08d}.jsonl")
+
+    def _rotate(self):
+        """Close the current segment, start a new one, and return the closed segment's path"""
+        closed = self._spool.name
+        self._spool.close()
+        self._spool = open(self._next_segment(), 'a')
+        return closed
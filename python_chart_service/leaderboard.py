@@ -0,0 +1,70 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+# Windows the brands are ranked over, in days ending today (UTC)
+RANKING_PERIODS = {'1d': 1, '7d': 7, '30d': 30, '90d': 90}
+
+class LeaderboardRefresher:
+    """Background thread that keeps the cross-brand rankings materialized.
+
+    Every interval seconds (and once right after start) each brand table
+    from tables() has its rollups brought up to date with refresh(table),
+    which only reads rows created since its watermark, and then
+    store.refresh_rankings() rebuilds every period from the rollups in one
+    pass. Reading the leaderboard is then an indexed query however many
+    brands there are.
+    """
+
+    def __init__(self, store, tables, refresh, interval, periods=RANKING_PERIODS):
+        self.store = store
+        self.tables = tables
+        self.refresh = refresh
+        self.interval = interval
+        self.periods = periods
+        self.refreshed_at = None
+        self.counts = {'refreshed': 0, 'failed': 0}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='leaderboard', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self):
+        """Refresh every table's rollups, then rebuild the rankings; returns the tables ranked"""
+        started = time.perf_counter()
+        tables = self.tables()
+        for table_name in tables:
+            if self._stop.is_set():
+                return tables
+            try:
+                self.refresh(table_name)
+            except Exception as e:
+                # Rank the table on the rollups it already has
+                print(f"Could not refresh rollups for {table_name}: {e}")
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        self.store().refresh_rankings(tables, self.periods, today)
+        self.refreshed_at = time.time()
+        print(f"Ranked {len(tables)} brand tables in {time.perf_counter() - started:.2f}s")
+        return tables
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                self.counts['refreshed'] += 1
+            except Exception as e:
+                print(f"Leaderboard refresh failed: {e}")
+                self.counts['failed'] += 1
+            self._stop.wait(self.interval)
@@ -0,0 +1,171 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets (seconds) for request and stage durations
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Spans:
+    """Seconds spent per stage (fetch, parse, aggregate, render, encode) in one request"""
+
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def merge(self, seconds):
+        for name, value in seconds.items():
+            self.add(name, value)
+
+_current_spans = contextvars.ContextVar('spans', default=None)
+
+def start_spans():
+    """Start collecting stage timings for the current request; returns a reset token"""
+    return _current_spans.set(Spans())
+
+def current_spans():
+    return _current_spans.get()
+
+def end_spans(token):
+    spans = _current_spans.get()
+    _current_spans.reset(token)
+    return spans
+
+@contextmanager
+def stage(name):
+    """Time a block as one stage of the current request (a no-op outside one)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans = _current_spans.get()
+        if spans is not None:
+            spans.add(name, time.perf_counter() - started)
+
+def collect_spans(fn, *args):
+    """Run fn(*args) with its own span collector; returns (result, {stage: seconds}).
+
+    Used for work done in a render process, whose timings are sent back and
+    merged into the request that submitted it.
+    """
+    token = start_spans()
+    try:
+        result = fn(*args)
+    finally:
+        spans = end_spans(token)
+    return result, spans.seconds
+
+def propagate(fn):
+    """Wrap fn to run in a copy of the caller's context, e.g. on a thread pool.
+
+    Every call gets its own copy (a context can't be entered by two threads
+    at once), but they all share the request's span collector.
+    """
+    context = contextvars.copy_context()
+    return lambda *args: context.copy().run(fn, *args)
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            counts, total, observed = self._values.get(label_values, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[label_values] = (counts, total + value, observed + 1)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.labels + ('le',)
+        with self._lock:
+            for label_values, (counts, total, observed) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_labels(bucket_labels, label_values + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(bucket_labels, label_values + ('+Inf',))} {observed}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {observed}")
+        return lines
+
+class Gauge:
+    """A value read at scrape time from a callback returning {label values: value}"""
+
+    def __init__(self, name, help_text, read, labels=(), kind='gauge'):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.labels = labels
+        self.kind = kind
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, value in sorted(self.read().items()):
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Registry:
+    """Process-wide metrics, exposed in the Prometheus text format.
+
+    Each gunicorn worker keeps its own registry, so a scrape reports the
+    worker that answered it; scrape every worker (or sum in Prometheus) for
+    service-wide numbers.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, read, labels=(), kind='gauge'):
+        return self.register(Gauge(name, help_text, read, labels, kind))
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
@@ -1,7 +1,8 @@
 from supabase import create_client, Client
-from datetime import datetime, timedelta
 import random
-import uuid
+
+from bulk_load import Checkpoint, load_table, synthetic_rows
+from data_source import SupabaseDataSource
 
 # Supabase configuration
 SUPABASE_URL = "https://tjpilnhmtwjvhmbaxtcx.supabase.co"
@@ -9,54 +10,22 @@ SUPABASE_KEY = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBhYmFzZSIsInJ
 
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+data_source = SupabaseDataSource(SUPABASE_URL, SUPABASE_KEY)
 
 def populate_sunkist_data():
-    """Populate sunkist_data table with sample data using halos_data schema"""
+    """Populate sunkist_data table with sample data through the bulk loader (see bulk_load.py for large loads)"""
     try:
         print("Populating sunkist_data with sample data...")
 
-        # Generate sample data for the last 10 days
-        sample_data = []
-        base_date = datetime.now() - timedelta(days=10)
-
-        for i in range(20):  # 20 data points over 10 days
-            # Random date within the last 10 days
-            days_ago = random.uniform(0, 10)
-            date = base_date + timedelta(days=days_ago)
-
-            # Random ripeness score (0-15 scale as per your specification)
-            ripeness_score = round(random.uniform(0, 15), 2)
-
-            # Sunkist locations (California citrus areas)
-            locations = [
-                (34.0522, -118.2437),  # Los Angeles
-                (34.4208, -119.6982),  # Ventura
-                (36.7378, -119.7871),  # Fresno
-                (35.3733, -119.0187),  # Bakersfield
-                (33.9425, -117.2297),  # Riverside
-            ]
-            lat, lng = random.choice(locations)
-            lat += random.uniform(-0.1, 0.1)
-            lng += random.uniform(-0.1, 0.1)
-
-            sample_data.append({
-                'id': str(uuid.uuid4()),
-                'ripeness_score': ripeness_score,
-                'latitude': round(lat, 6),
-                'longitude': round(lng, 6),
-                'location_description': f"{lat:.4f}, {lng:.4f}",
-                'fruit_type': 'Orange',
-                'analyzed_at': date.isoformat(),
-                'created_at': datetime.now().isoformat()
-            })
-
-        # Insert data
-        response = supabase.table('sunkist_data').insert(sample_data).execute()
-        print(f"✅ Successfully inserted {len(sample_data)} records into sunkist_data")
+        # 20 data points over the last 10 days, in California citrus areas,
+        # written in one batch with retries
+        chunks = list(synthetic_rows('sunkist_data', 20, seed=random.randrange(2 ** 32), days=10, chunk_size=500))
+        written = load_table(data_source, 'sunkist_data', chunks, Checkpoint(None, {}))
+        print(f"✅ Successfully inserted {written} records into sunkist_data")
 
-        # Show sample of inserted data
+        # Show sample of inserted data (chunks are seeded, so this regenerates them)
         print("\nSample records:")
-        for i, record in enumerate(sample_data[:3]):
+        for i, record in enumerate(chunks[0][1]()[:3]):
             print(f"  {i+1}. Ripeness: {record['ripeness_score']}, Date: {record['analyzed_at'][:10]}")
 
         return True
@@ -0,0 +1,137 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class DemandTracker:
+    """Exponentially decayed request counts, to find the hottest charts.
+
+    Each request adds 1 to its key's score and scores halve every half_life
+    seconds, so yesterday morning's dashboards still rank above a chart
+    opened once last week. At most max_entries keys are kept; the coldest
+    are dropped first.
+    """
+
+    def __init__(self, half_life, max_entries=1000):
+        self.half_life = half_life
+        self.max_entries = max_entries
+        self._scores = {}  # key -> (score, updated_at)
+        self._lock = threading.Lock()
+
+    def record(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._scores[key] = (self._decayed(key, now) + 1, now)
+            if len(self._scores) > self.max_entries:
+                coldest = min(self._scores, key=lambda k: self._decayed(k, now))
+                del self._scores[coldest]
+
+    def top(self, n, now=None):
+        """The n keys with the highest current score, hottest first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return sorted(self._scores, key=lambda k: self._decayed(k, now), reverse=True)[:n]
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _decayed(self, key, now):
+        score, updated_at = self._scores.get(key, (0.0, now))
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+class Precomputer:
+    """Background thread that re-renders the hottest charts ahead of demand.
+
+    Every interval seconds the top_n keys of the tracker are checked:
+    version(key) returns the data fingerprint the chart would be drawn from,
+    and warm(key) renders it into the cache. A key is warmed when its
+    fingerprint has changed since it was last warmed (new scans arrived) or
+    refresh_after seconds have passed, so cached charts are replaced before
+    they expire.
+
+    Pre-rendering must not starve live requests: at most `concurrency` keys
+    are warmed at once, each worker sleeps after a job so that it is busy
+    at most cpu_share of the time, and a job is skipped (until the next
+    cycle) while busy() reports the renderer is needed by live traffic.
+    """
+
+    def __init__(self, tracker, version, warm, top_n, interval, refresh_after,
+                 concurrency=1, cpu_share=0.25, busy=lambda: False):
+        self.tracker = tracker
+        self.version = version
+        self.warm = warm
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_after = refresh_after
+        self.concurrency = concurrency
+        self.cpu_share = cpu_share
+        self.busy = busy
+        self.counts = {'warmed': 0, 'skipped': 0, 'failed': 0}
+        self._warmed = {}  # key -> (version, warmed_at)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='chart-precompute', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self):
+        """Warm every hot key that is due; returns how many were warmed"""
+        keys = self.tracker.top(self.top_n)
+        with self._lock:
+            # Forget keys that have dropped out of the hot set
+            self._warmed = {key: self._warmed[key] for key in keys if key in self._warmed}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return sum(executor.map(self._warm_if_due, keys))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Precompute cycle failed: {e}")
+
+    def _warm_if_due(self, key):
+        if self._stop.is_set():
+            return False
+        try:
+            version = self.version(key)
+        except Exception as e:
+            print(f"Could not check {key} for precompute: {e}")
+            self._count('failed')
+            return False
+        with self._lock:
+            warmed = self._warmed.get(key)
+        if version is None or (warmed and warmed[0] == version and time.time() - warmed[1] < self.refresh_after):
+            return False
+        if self.busy():
+            self._count('skipped')
+            return False
+
+        started = time.perf_counter()
+        try:
+            self.warm(key)
+        except Exception as e:
+            print(f"Precompute of {key} failed: {e}")
+            self._count('failed')
+            return False
+        finally:
+            # Idle long enough that this worker stays within its CPU share
+            elapsed = time.perf_counter() - started
+            self._stop.wait(elapsed * (1 - self.cpu_share) / self.cpu_share)
+        with self._lock:
+            self._warmed[key] = (version, time.time())
+        self._count('warmed')
+        return True
+
+    def _count(self, result):
+        with self._lock:
+            self.counts[result] += 1
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def make_cache_key(*parts):
+    """Content-addressed key for a rendered chart.
+
+    The parts (route, table, window, render params, data fingerprint) fully
+    determine the output bytes, so the hash doubles as the response ETag.
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+class RenderCache:
+    """LRU cache of rendered chart bytes with a TTL and an optional disk tier.
+
+    Memory is bounded by total payload size; the least recently used entries
+    are evicted first. When disk_dir is set, entries are also written there
+    so they survive restarts and can be shared between worker processes.
+    """
+
+    def __init__(self, max_bytes, ttl, disk_dir=None, disk_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (stored_at, payload)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, payload = entry
+                if now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                self._remove(key)
+        payload, stored_at = self._read_disk(key, now)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, payload, stored_at)
+        return payload
+
+    def put(self, key, payload):
+        now = time.time()
+        with self._lock:
+            self._store(key, payload, now)
+        self._write_disk(key, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _store(self, key, payload, stored_at):
+        if len(payload) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (stored_at, payload)
+        self._size += len(payload)
+        while self._size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None, None
+        path = self._disk_path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if now - stored_at >= self.ttl:
+                os.remove(path)
+                return None, None
+            with open(path, 'rb') as f:
+                return f.read(), stored_at
+        except OSError:
+            return None, None
+
+    def _write_disk(self, key, payload):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError as e:
+            print(f"Could not write chart cache entry to disk: {e}")
+
+    def _prune_disk(self):
+        """Drop the oldest disk entries once the disk tier exceeds its budget"""
+        if not self.disk_max_bytes:
+            return
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.bin'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,114 @@
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import collect_spans, current_spans
+
+class RenderPoolBusy(Exception):
+    """Every worker is busy and the queue is full; the client should retry"""
+
+class RenderTimeout(Exception):
+    """A render job did not finish within the pool's timeout"""
+
+class RenderPool:
+    """Process pool that draws charts off the request thread.
+
+    Workers are spawned with matplotlib already imported and warmed up, so
+    renders run in parallel instead of contending for pyplot's global state
+    and the GIL. At most workers + queue_size jobs are admitted at once;
+    beyond that render() raises RenderPoolBusy instead of queueing without
+    bound. With workers=0 charts are drawn in-process, one at a time.
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inline_lock = threading.Lock()
+
+    def start(self):
+        """Spawn and warm every worker now rather than on the first render"""
+        if self.workers:
+            import chart_render
+
+            executor = self._get_executor()
+            for future in [executor.submit(chart_render.warm_up) for _ in range(self.workers)]:
+                future.result()
+
+    @property
+    def busy(self):
+        """Whether every worker is taken, so a new job would have to queue"""
+        return self.in_flight >= max(self.workers, 1)
+
+    def render(self, render, *args):
+        """Run a chart_render function in a worker and return its result"""
+        if not self._slots.acquire(blocking=False):
+            raise RenderPoolBusy()
+        with self._in_flight_lock:
+            self.in_flight += 1
+        if not self.workers:
+            try:
+                with self._inline_lock:
+                    return render(*args)
+            finally:
+                self._release()
+
+        try:
+            # Stage timings taken in the worker are merged into this request's
+            future = self._get_executor().submit(collect_spans, render, *args)
+        except Exception:
+            self._release()
+            raise
+        # The slot is held until the job really finishes, even after a timeout,
+        # so a backlog of slow renders still turns new requests away
+        future.add_done_callback(lambda _: self._release())
+        try:
+            result, seconds = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise RenderTimeout()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next request
+            self._reset()
+            raise
+        spans = current_spans()
+        if spans is not None:
+            spans.merge(seconds)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _release(self):
+        with self._in_flight_lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _get_executor(self):
+        import chart_render
+
+        with self._lock:
+            if self._executor is None:
+                # Spawned (not forked) workers don't inherit the server's threads or sockets
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=chart_render.warm_up,
+                )
+                atexit.register(self.shutdown)
+            return self._executor
+
+    def _reset(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -0,0 +1,141 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Upper ripeness bounds of the "very ripe" and "just ripe" bands, and the
+# estimated shelf life in days for each band (very ripe, just ripe, unripe)
+RIPENESS_BANDS = [3, 7]
+SHELF_LIFE_DAYS = np.array([1.5, 4.0, 8.0])
+SHELF_LIFE_BUCKETS = ['very_ripe', 'just_ripe', 'unripe']
+
+def shelf_life_bucket(scores):
+    """Band index (0 very ripe, 1 just ripe, 2 unripe) for an array of ripeness scores"""
+    return np.digitize(scores, RIPENESS_BANDS, right=True)
+
+def shelf_life_days(scores):
+    """Vectorized convert_ripeness_to_shelf_life over an array of ripeness scores"""
+    return SHELF_LIFE_DAYS[shelf_life_bucket(scores)]
+
+# Ripeness histogram kept per day in the rollups: fixed 0.1-wide bins over the
+# 0-15 scale, so histograms of any set of days merge by adding their counts
+HISTOGRAM_BIN_WIDTH = 0.1
+HISTOGRAM_BINS = 150
+
+def histogram_bins(scores):
+    """Histogram bin of each ripeness score (out-of-scale scores go to the end bins)"""
+    bins = np.floor(np.asarray(scores, dtype=float) / HISTOGRAM_BIN_WIDTH + 1e-9).astype(np.int64)
+    return np.clip(bins, 0, HISTOGRAM_BINS - 1)
+
+def histogram_quantiles(counts, quantiles):
+    """Quantiles of a ripeness histogram, interpolating linearly within a bin.
+
+    Accurate to within one bin width (0.1) of the exact percentile.
+    """
+    total = counts.sum()
+    if not total:
+        return [None] * len(quantiles)
+    cumulative = np.cumsum(counts)
+    results = []
+    for q in quantiles:
+        rank = q * total
+        # First bin whose cumulative count reaches the rank (skipping empty bins at q=0)
+        i = min(int(np.searchsorted(cumulative, rank, side='left' if rank else 'right')), len(counts) - 1)
+        fraction = (rank - (cumulative[i] - counts[i])) / counts[i]
+        results.append(float((i + fraction) * HISTOGRAM_BIN_WIDTH))
+    return results
+
+def load_scan_frame(rows):
+    """Build the columnar frame every chart and summary is computed from.
+
+    Timestamps are parsed in one bulk pass to UTC, rows without a valid
+    analyzed_at or ripeness_score are dropped, and the shelf-life estimate is
+    derived for the whole column at once. The frame is sorted by analyzed_at.
+    """
+    raw = pd.DataFrame.from_records(rows, columns=['analyzed_at', 'ripeness_score'])
+    frame = pd.DataFrame({
+        'analyzed_at': pd.to_datetime(raw['analyzed_at'], utc=True, errors='coerce', format='ISO8601'),
+        'ripeness_score': pd.to_numeric(raw['ripeness_score'], errors='coerce').astype(float),
+    }).dropna()
+    frame['shelf_life'] = shelf_life_days(frame['ripeness_score'].to_numpy())
+    return frame.sort_values('analyzed_at', kind='stable').reset_index(drop=True)
+
+def daily_means(frame, column):
+    """Mean of a column per UTC day, for days that have at least one scan"""
+    return frame.set_index('analyzed_at')[column].resample('D').mean().dropna()
+
+def plot_times(times):
+    """Timezone-naive UTC datetime64 values for matplotlib"""
+    return pd.DatetimeIndex(times).tz_convert(None).to_numpy()
+
+# Level-of-detail for the ripeness chart: aggregation buckets, finest first, as
+# (pandas frequency, bucket length), and horizontal pixels per bucket or raw point
+LOD_BUCKETS = {
+    'hour': ('h', pd.Timedelta(hours=1)),
+    'day': ('D', pd.Timedelta(days=1)),
+    'week': ('W-MON', pd.Timedelta(weeks=1)),
+}
+LOD_MODES = ['auto', 'raw', 'bands', 'lttb']
+PIXELS_PER_BUCKET = 2
+PIXELS_PER_POINT = 2
+
+# Plot data for the ripeness chart. level is 'raw', 'lttb' or a LOD_BUCKETS
+# name; bucketed frames also carry per-bucket 'low', 'high' and 'count'.
+RipenessPlot = namedtuple('RipenessPlot', ['frame', 'level'])
+
+def lttb(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of len(x)"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # First and last points are kept; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    selected = 0
+    for i in range(threshold - 2):
+        low, high = edges[i], edges[i + 1]
+        next_high = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[high:next_high].mean(), y[high:next_high].mean()
+        # Keep the point forming the largest triangle with the last kept point
+        # and the average of the next bucket
+        area = np.abs((x[selected] - next_x) * (y[low:high] - y[selected])
+                      - (x[selected] - x[low:high]) * (next_y - y[selected]))
+        selected = low + int(area.argmax())
+        keep[i + 1] = selected
+    return keep
+
+def bucket_stats(frame, level):
+    """Min/mean/max ripeness per hour, day or week, plotted at the bucket centre"""
+    freq, length = LOD_BUCKETS[level]
+    stats = frame.set_index('analyzed_at')['ripeness_score'].resample(freq, label='left', closed='left').agg(
+        ['min', 'mean', 'max', 'count'])
+    stats = stats[stats['count'] > 0]
+    return pd.DataFrame({
+        'analyzed_at': stats.index + length / 2,
+        'ripeness_score': stats['mean'].to_numpy(),
+        'low': stats['min'].to_numpy(),
+        'high': stats['max'].to_numpy(),
+        'count': stats['count'].to_numpy(),
+    })
+
+def ripeness_lod(frame, width_px, mode='auto'):
+    """Reduce a scan frame to what a chart width_px wide can show.
+
+    auto keeps every scan while there are at most width_px / PIXELS_PER_POINT
+    of them, and otherwise aggregates to the finest bucket (hour, day, week)
+    that leaves PIXELS_PER_BUCKET pixels per bucket. bands always aggregates,
+    lttb keeps the visually significant raw scans, raw keeps everything.
+    Either way the points drawn are bounded by the width, not the row count.
+    """
+    if mode == 'raw' or (mode == 'auto' and len(frame) <= width_px // PIXELS_PER_POINT):
+        return RipenessPlot(frame, 'raw')
+    if mode == 'lttb':
+        times = plot_times(frame['analyzed_at']).astype('int64').astype(float)
+        keep = lttb(times, frame['ripeness_score'].to_numpy(), int(width_px // PIXELS_PER_POINT))
+        return RipenessPlot(frame.iloc[keep].reset_index(drop=True), 'lttb')
+
+    span = frame['analyzed_at'].iloc[-1] - frame['analyzed_at'].iloc[0]
+    max_buckets = width_px / PIXELS_PER_BUCKET
+    level = next((level for level, (_, length) in LOD_BUCKETS.items() if span / length <= max_buckets), 'week')
+    return RipenessPlot(bucket_stats(frame, level), level)
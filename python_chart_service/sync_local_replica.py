@@ -0,0 +1,38 @@
+import argparse
+
+from config import SUPABASE_URL, SUPABASE_KEY
+from data_source import SupabaseDataSource, create_data_source
+from table_registry import TableRegistry
+
+DEFAULT_TABLES = ['halos_data', 'sunkist_data', 'dole_data']
+
+def sync_tables(source, target, tables):
+    """Copy each brand table from source into the local target"""
+    synced = 0
+    for table in tables:
+        try:
+            rows = source.fetch_rows(table)
+            target.replace_rows(table, rows)
+            print(f"✅ Synced {len(rows)} rows from '{table}'")
+            synced += 1
+        except Exception as e:
+            print(f"❌ Could not sync '{table}': {e}")
+    return synced
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy brand tables from Supabase into a local SQLite/Parquet replica")
+    parser.add_argument('--backend', choices=['sqlite', 'parquet'], default='sqlite')
+    parser.add_argument('--path', default='local_data.db',
+                        help="SQLite database file, or directory for Parquet files")
+    parser.add_argument('tables', nargs='*', help="Tables to copy (default: every brand table)")
+    args = parser.parse_args()
+
+    source = SupabaseDataSource(SUPABASE_URL, SUPABASE_KEY)
+    tables = args.tables or list(TableRegistry(source).tables() or DEFAULT_TABLES)
+    print(f"=== Syncing {len(tables)} tables into {args.backend} replica at {args.path} ===\n")
+    target = create_data_source(args.backend, local_path=args.path)
+    synced = sync_tables(source, target, tables)
+    print(f"\n🎉 Synced {synced} of {len(tables)} tables")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import json
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from data_source import BRAND_COLUMNS, create_data_source
+
+# Cached description of one brand table; first/latest are analyzed_at values
+TableInfo = namedtuple('TableInfo', ['name', 'columns', 'count', 'first', 'latest'])
+
+def sanitize_brand_name(brand_name):
+    """Brand name as used in table names, matching get_brand_table_name() in BRAND_TABLE_SCHEMA.sql"""
+    name = re.sub(r'[^a-z0-9]', '_', brand_name.lower())
+    return re.sub(r'_+', '_', name).strip('_')
+
+def brand_table_name(brand_name):
+    """Table holding a brand's scans (e.g., Del Monte -> del_monte_data)"""
+    return f"{sanitize_brand_name(brand_name)}_data"
+
+def supplier_table_name(email):
+    """Table for a supplier email; the part before @ is the brand name (e.g., del.monte@env.com -> del_monte_data)"""
+    return brand_table_name(email.split('@')[0])
+
+class TableRegistry:
+    """Which brand tables exist, with cached columns and row stats.
+
+    All brand tables are discovered with one list_tables() call, and the
+    listing is re-read lazily once it is older than ttl seconds, so exists()
+    is a dictionary lookup. A table's row count and analyzed_at range are
+    read on first use and kept for stats_ttl seconds. Sources that can't
+    list their tables are probed one table at a time instead, with the
+    answer cached for ttl seconds the same way.
+    """
+
+    def __init__(self, source, ttl=300, stats_ttl=60):
+        self.source = source
+        self.ttl = ttl
+        self.stats_ttl = stats_ttl
+        self._tables = None  # {table: columns}; None when the source can't list them
+        self._listed_at = None
+        self._probed = {}  # table -> (exists, checked_at)
+        self._stats = {}  # table -> (TableInfo, checked_at)
+        self._lock = threading.Lock()
+
+    def tables(self):
+        """{table: columns} for every brand table, or None if the source can't list them"""
+        with self._lock:
+            if self._listed_at is not None and time.time() - self._listed_at < self.ttl:
+                return self._tables
+        try:
+            tables = self.source.list_tables()
+        except NotImplementedError:
+            tables = None
+        except Exception as e:
+            print(f"Could not list brand tables: {e}")
+            if self.source.is_backend_error(e):
+                # Keep the last listing and try again on the next call
+                with self._lock:
+                    return self._tables
+            tables = None
+        with self._lock:
+            self._tables, self._listed_at = tables, time.time()
+        return tables
+
+    def exists(self, table_name):
+        """Whether a brand table exists (assumed to when the backend can't say)"""
+        tables = self.tables()
+        if tables is not None:
+            return table_name in tables
+        with self._lock:
+            probed = self._probed.get(table_name)
+        if probed and time.time() - probed[1] < self.ttl:
+            return probed[0]
+        try:
+            self.source.fingerprint(table_name)
+            exists = True
+        except Exception as e:
+            if self.source.is_backend_error(e):
+                return True
+            exists = False
+        with self._lock:
+            self._probed[table_name] = (exists, time.time())
+        return exists
+
+    def info(self, table_name):
+        """TableInfo for a table, or None if it doesn't exist"""
+        with self._lock:
+            cached = self._stats.get(table_name)
+        if cached and time.time() - cached[1] < self.stats_ttl:
+            return cached[0]
+        if not self.exists(table_name):
+            return None
+        count, first, latest = self.source.table_stats(table_name)
+        columns = (self.tables() or {}).get(table_name)
+        info = TableInfo(table_name, columns, count, first, latest)
+        with self._lock:
+            self._stats[table_name] = (info, time.time())
+        return info
+
+    def all_info(self, concurrency=8):
+        """TableInfo for every brand table, reading stale stats concurrently"""
+        tables = self.tables()
+        if tables is None:
+            raise NotImplementedError(f"{self.source.name} data source can't list its tables")
+        if not tables:
+            return []
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return [info for info in executor.map(self.info, sorted(tables)) if info is not None]
+
+    def invalidate(self, table_name=None):
+        """Forget cached data, e.g. after creating a table"""
+        with self._lock:
+            if table_name is None:
+                self._listed_at = None
+                self._probed.clear()
+                self._stats.clear()
+            else:
+                self._probed.pop(table_name, None)
+                self._stats.pop(table_name, None)
+                if self._tables is not None and table_name not in self._tables:
+                    self._listed_at = None
+
+def describe(info):
+    """One table's registry entry as JSON-friendly values"""
+    columns = info.columns or []
+    return {
+        'table': info.name,
+        'rows': info.count,
+        'first_analyzed_at': info.first,
+        'latest_analyzed_at': info.latest,
+        'columns': columns,
+        'missing_columns': [column for column in BRAND_COLUMNS if info.columns is not None and column not in columns],
+    }
+
+def main():
+    from config import SUPABASE_URL, SUPABASE_KEY, DATA_SOURCE, LOCAL_DATA_PATH
+
+    parser = argparse.ArgumentParser(description="List every brand table with its row count, analyzed_at range and columns")
+    parser.add_argument('--source', choices=['supabase', 'sqlite', 'parquet'], default=DATA_SOURCE)
+    parser.add_argument('--path', default=LOCAL_DATA_PATH, help="SQLite database file, or directory of Parquet files")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--json', action='store_true', help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    registry = TableRegistry(create_data_source(args.source, SUPABASE_URL, SUPABASE_KEY, args.path))
+    started = time.perf_counter()
+    tables = [describe(info) for info in registry.all_info(args.concurrency)]
+    if args.json:
+        print(json.dumps(tables, indent=2))
+        return
+
+    print(f"=== {len(tables)} brand tables in {args.source} ({time.perf_counter() - started:.2f}s) ===\n")
+    for table in tables:
+        print(f"{table['table']:<28} {table['rows']:>9} rows  "
+              f"{table['first_analyzed_at'] or '-'} .. {table['latest_analyzed_at'] or '-'}")
+        if table['missing_columns']:
+            print(f"  ⚠️  Missing columns: {', '.join(table['missing_columns'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# The service is a flat set of modules run from its own directory
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+# chart_generator reads its settings at import: a local SQLite source, no
+# worker processes and no background threads
+APP_DIR = tempfile.mkdtemp(prefix='chart-service-tests-')
+os.environ.update({
+    'CHART_DATA_SOURCE': 'sqlite',
+    'CHART_DATA_PATH': os.path.join(APP_DIR, 'local.db'),
+    'CHART_AGGREGATE_DB': os.path.join(APP_DIR, 'aggregates.db'),
+    'CHART_INGEST_SPOOL_DIR': os.path.join(APP_DIR, 'spool'),
+    'CHART_RENDER_WORKERS': '0',
+    'CHART_PRECOMPUTE': '0',
+    'CHART_LEADERBOARD': '0',
+    'CHART_PRELOAD': '0',
+})
+
+# analyzed_at of the first generated scan; one scan every ten minutes after it
+BASE_TIME = datetime(2025, 9, 1, tzinfo=timezone.utc)
+
+def scan_rows(count, offset=0, created_at=None):
+    """Brand table rows spread over count * 10 minutes, scores cycling through 0-15"""
+    rows = []
+    for n in range(offset, offset + count):
+        analyzed_at = BASE_TIME + timedelta(minutes=10 * n)
+        rows.append({
+            'id': str(uuid.UUID(int=n + 1)),
+            'ripeness_score': round((n * 1.7) % 15, 2),
+            'latitude': 34.0 + (n % 10) * 0.013,
+            'longitude': -118.0 - (n % 7) * 0.011,
+            'location_description': 'Test',
+            'fruit_type': 'Orange',
+            'analyzed_at': analyzed_at.isoformat(timespec='microseconds'),
+            'created_at': created_at or (analyzed_at + timedelta(seconds=30)).isoformat(timespec='microseconds'),
+        })
+    return rows
+
+@pytest.fixture
+def sqlite_source(tmp_path):
+    from data_source import SQLiteDataSource
+
+    return SQLiteDataSource(str(tmp_path / 'local.db'))
+
+@pytest.fixture(scope='session')
+def app_client():
+    """Test client for chart_generator, serving 300 scans in sunkist_data"""
+    from data_source import SQLiteDataSource
+
+    SQLiteDataSource(os.environ['CHART_DATA_PATH']).replace_rows('sunkist_data', scan_rows(300))
+    import chart_generator
+
+    return chart_generator.app.test_client()
@@ -0,0 +1,139 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from aggregate_store import AggregateStore
+from conftest import scan_rows
+
+@pytest.fixture
+def store(tmp_path, sqlite_source):
+    sqlite_source.replace_rows('sunkist_data', scan_rows(400))
+    return AggregateStore(str(tmp_path / 'aggregates.db'), sqlite_source, page_size=64, lag=300)
+
+def totals(store):
+    daily = store.daily('sunkist_data')
+    return int(daily['count'].sum()), round(float(daily['sum'].sum()), 6)
+
+def expected_totals(rows):
+    return len(rows), round(sum(row['ripeness_score'] for row in rows), 6)
+
+def shifted(created_at, seconds):
+    return (datetime.fromisoformat(created_at) + timedelta(seconds=seconds)).isoformat(timespec='microseconds')
+
+def test_refresh_rolls_up_every_row(store):
+    assert store.refresh('sunkist_data') == 400
+    assert totals(store) == expected_totals(scan_rows(400))
+    cells = store.cells('sunkist_data')
+    assert int(cells['count'].sum()) == 400
+
+def test_refreshing_again_applies_nothing(store):
+    store.refresh('sunkist_data')
+    before = store.daily('sunkist_data')
+    assert store.refresh('sunkist_data') == 0
+    assert store.refresh('sunkist_data') == 0
+    assert store.daily('sunkist_data').equals(before)
+
+def test_new_rows_are_applied_once(store, sqlite_source):
+    store.refresh('sunkist_data')
+    sqlite_source.insert_rows('sunkist_data', scan_rows(50, offset=400))
+    assert store.refresh('sunkist_data') == 50
+    assert store.refresh('sunkist_data') == 0
+    assert totals(store) == expected_totals(scan_rows(450))
+
+def test_late_rows_with_older_created_at_are_applied(store, sqlite_source):
+    store.refresh('sunkist_data')
+    newest = store.watermark('sunkist_data')[0]
+    # Committed after the refresh, but stamped before the newest row seen
+    late = scan_rows(100, offset=400, created_at=shifted(newest, -120))
+    sqlite_source.insert_rows('sunkist_data', late)
+
+    assert store.refresh('sunkist_data') == 100
+    assert store.refresh('sunkist_data') == 0
+    assert totals(store) == expected_totals(scan_rows(500))
+    # The watermark doesn't move back
+    assert store.watermark('sunkist_data')[0] == newest
+
+def test_rows_without_created_at_are_skipped_consistently(store, sqlite_source):
+    store.refresh('sunkist_data')
+    watermark = store.watermark('sunkist_data')[:2]
+    rows = scan_rows(5, offset=400)
+    with sqlite_source.connect() as conn:
+        sqlite_source._insert(conn, 'sunkist_data', [dict(row, created_at=None) for row in rows])
+
+    assert store.refresh('sunkist_data') == 0
+    assert store.watermark('sunkist_data')[:2] == watermark
+    assert totals(store) == expected_totals(scan_rows(400))
+    assert store.rebuild('sunkist_data') == 400
+
+def test_rebuild_matches_the_incremental_rollups(store, sqlite_source):
+    store.refresh('sunkist_data')
+    sqlite_source.insert_rows('sunkist_data', scan_rows(70, offset=400))
+    store.refresh('sunkist_data')
+    incremental = store.daily('sunkist_data')
+    assert store.rebuild('sunkist_data') == 470
+    rebuilt = store.daily('sunkist_data')
+    assert rebuilt[['count', 'very_ripe', 'just_ripe', 'unripe', 'histogram']].equals(
+        incremental[['count', 'very_ripe', 'just_ripe', 'unripe', 'histogram']])
+    assert (rebuilt['sum'] - incremental['sum']).abs().max() < 1e-9
+
+def test_two_stores_on_one_database_never_double_count(store, tmp_path, sqlite_source):
+    other = AggregateStore(store.path, sqlite_source, page_size=17, lag=300)
+    store.refresh('sunkist_data')
+    sqlite_source.insert_rows('sunkist_data', scan_rows(30, offset=400))
+    assert other.refresh('sunkist_data') == 30
+    assert store.refresh('sunkist_data') == 0
+    assert totals(store) == expected_totals(scan_rows(430))
+
+def test_applied_ids_are_only_kept_for_the_lag_window(store):
+    store.refresh('sunkist_data')
+    with store.connect() as conn:
+        kept = conn.execute("SELECT COUNT(*) FROM applied_rows").fetchone()[0]
+    # One scan every ten minutes: the last 300 seconds hold a single row
+    assert 1 <= kept <= 2
+
+def test_models_are_refit_after_late_rows(store, sqlite_source):
+    store.refresh('sunkist_data')
+    store.save_model('sunkist_data', 'forecast', {'fitted': 1}, store.watermark('sunkist_data'))
+    assert store.model('sunkist_data', 'forecast') == {'fitted': 1}
+
+    newest = store.watermark('sunkist_data')[0]
+    sqlite_source.insert_rows('sunkist_data', scan_rows(3, offset=400, created_at=shifted(newest, -60)))
+    store.refresh('sunkist_data')
+    assert store.model('sunkist_data', 'forecast') is None
+
+def test_refresh_if_stale_skips_recent_refreshes(store, sqlite_source):
+    store.refresh('sunkist_data')
+    sqlite_source.insert_rows('sunkist_data', scan_rows(10, offset=400))
+    assert store.refresh_if_stale('sunkist_data', max_age=3600) == 0
+    assert store.refresh_if_stale('sunkist_data', max_age=3600, changed_at=float('inf')) == 10
+
+class BlockingSource:
+    """Delegates to a source, but holds page reads of one table until released"""
+
+    def __init__(self, source, table_name):
+        self.source = source
+        self.table_name = table_name
+        self.reading, self.release = threading.Event(), threading.Event()
+
+    def iter_pages(self, table_name, *args, **kwargs):
+        if table_name == self.table_name:
+            self.reading.set()
+            self.release.wait(10)
+        return self.source.iter_pages(table_name, *args, **kwargs)
+
+def test_a_slow_refresh_does_not_hold_up_other_tables(store, sqlite_source):
+    sqlite_source.replace_rows('halos_data', scan_rows(10))
+    blocking = BlockingSource(sqlite_source, 'halos_data')
+    slow_store = AggregateStore(store.path, blocking, page_size=64, lag=300)
+    slow = threading.Thread(target=slow_store.refresh, args=('halos_data',))
+    slow.start()
+    try:
+        assert blocking.reading.wait(5)
+        assert slow_store.refresh('sunkist_data') == 400
+        # Done while the halos_data refresh is still waiting on the backend
+        assert slow.is_alive()
+    finally:
+        blocking.release.set()
+        slow.join(5)
+    assert int(slow_store.daily('halos_data')['count'].sum()) == 10
@@ -0,0 +1,51 @@
+import base64
+
+import pytest
+
+def batch(app_client, **body):
+    return app_client.post('/supplier_batch', json=body)
+
+def test_batch_summarizes_and_charts_every_supplier(app_client):
+    response = batch(app_client, suppliers=['sunkist@example.com', 'nobody@example.com'],
+                     charts=['ripeness', 'shelf_life'], compare=True, format='series')
+    assert response.status_code == 200
+    results = response.get_json()['suppliers']
+    sunkist = results['sunkist@example.com']
+    assert sunkist['summary']['total_analyses'] == 300
+    assert set(sunkist['charts']) == {'ripeness', 'shelf_life'}
+    assert sunkist['charts']['shelf_life']['date'][0] == '2025-09-01'
+    assert results['nobody@example.com'] == {'error': 'No data found'}
+    assert set(response.get_json()['comparison']) == {'Sunkist'}
+
+def test_images_are_base64_encoded(app_client):
+    response = batch(app_client, suppliers=['sunkist@example.com'], charts=['shelf_life'], dpi=40)
+    chart = response.get_json()['suppliers']['sunkist@example.com']['charts']['shelf_life']
+    assert base64.b64decode(chart).startswith(b'\x89PNG')
+
+def test_suppliers_sharing_a_table_fetch_it_once(app_client, monkeypatch):
+    import chart_generator
+
+    fetched = []
+    load = chart_generator.load_chart_frame
+    monkeypatch.setattr(chart_generator, 'load_chart_frame',
+                        lambda table, start, end: fetched.append(table) or load(table, start, end))
+    response = batch(app_client, suppliers=['sunkist@example.com', 'sunkist@example.org'])
+    assert response.status_code == 200
+    assert fetched == ['sunkist_data']
+    results = response.get_json()['suppliers']
+    assert results['sunkist@example.com'] == results['sunkist@example.org']
+
+@pytest.mark.parametrize('body, message', [
+    ([], 'JSON object'),
+    ({'suppliers': 'sunkist@example.com'}, "'suppliers'"),
+    ({'suppliers': []}, "'suppliers'"),
+    ({'suppliers': ['sunkist@example.com'] * 51}, 'At most 50'),
+    ({'suppliers': ['sunkist@example.com'], 'charts': 'ripeness'}, "'charts'"),
+    ({'suppliers': ['sunkist@example.com'], 'charts': ['pie']}, 'Unknown charts: pie'),
+    ({'suppliers': ['sunkist@example.com'], 'dpi': True}, "'dpi' has the wrong type"),
+    ({'suppliers': ['sunkist@example.com'], 'start': '2025-09-02', 'end': '2025-09-01'}, 'before'),
+])
+def test_bad_batches_are_rejected(app_client, body, message):
+    response = app_client.post('/supplier_batch', json=body)
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from bulk_load import Checkpoint, file_chunks, load_table, synthetic_rows
+
+def test_synthetic_rows_are_the_same_for_the_same_seed_and_anchor():
+    first = [row for _, chunk in synthetic_rows('sunkist_data', 25, 7, 10, 10, '2025-09-20') for row in chunk()]
+    again = [row for _, chunk in synthetic_rows('sunkist_data', 25, 7, 10, 10, '2025-09-20') for row in chunk()]
+    assert first == again
+    assert len({row['id'] for row in first}) == 25
+    assert all('2025-09-10' <= row['analyzed_at'][:10] < '2025-09-20' for row in first)
+
+def test_file_chunks_fill_in_stable_ids():
+    rows = [{'ripeness_score': 5.0, 'analyzed_at': '2025-09-01T00:00:00+00:00'} for _ in range(5)]
+    ids = [row['id'] for _, chunk in file_chunks(iter(rows), 'sunkist_data', 'scans.csv', 2) for row in chunk()]
+    again = [{'ripeness_score': 5.0, 'analyzed_at': '2025-09-01T00:00:00+00:00'} for _ in range(5)]
+    assert ids == [row['id'] for _, chunk in file_chunks(iter(again), 'sunkist_data', 'scans.csv', 2)
+                   for row in chunk()]
+    assert len(set(ids)) == 5
+
+class FlakySource:
+    """Fails its first `failures` inserts with a backend error"""
+
+    def __init__(self, sqlite_source, failures):
+        self.sqlite_source = sqlite_source
+        self.failures = failures
+        self.calls = 0
+
+    def insert_rows(self, table_name, rows):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("backend down")
+        self.sqlite_source.insert_rows(table_name, rows)
+
+    def is_backend_error(self, exc):
+        return isinstance(exc, ConnectionError)
+
+def count(sqlite_source):
+    return len(sqlite_source.fetch_rows('sunkist_data', None))
+
+def test_load_writes_every_chunk_and_marks_it_done(sqlite_source, tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'load.json'), {'synthetic': 95})
+    chunks = synthetic_rows('sunkist_data', 95, 0, 10, 10, '2025-09-20')
+    assert load_table(sqlite_source, 'sunkist_data', chunks, checkpoint, concurrency=3) == 95
+    assert checkpoint.done == set(range(10))
+    assert count(sqlite_source) == 95
+
+def test_backend_failures_are_retried(sqlite_source):
+    source = FlakySource(sqlite_source, failures=2)
+    chunks = synthetic_rows('sunkist_data', 30, 0, 10, 10, '2025-09-20')
+    assert load_table(source, 'sunkist_data', chunks, Checkpoint(None, {}), concurrency=1, backoff=0) == 30
+    assert source.calls == 5
+    assert count(sqlite_source) == 30
+
+def test_a_load_stops_once_retries_run_out(sqlite_source):
+    source = FlakySource(sqlite_source, failures=3)
+    checkpoint = Checkpoint(None, {})
+    with pytest.raises(ConnectionError):
+        load_table(source, 'sunkist_data', synthetic_rows('sunkist_data', 30, 0, 10, 10, '2025-09-20'),
+                   checkpoint, concurrency=1, attempts=3, backoff=0)
+    assert checkpoint.done == set()
+
+def test_an_interrupted_load_resumes_where_it_stopped(sqlite_source, tmp_path):
+    path = str(tmp_path / 'load.json')
+    load = {'synthetic': 50, 'seed': 3}
+    rows = synthetic_rows('sunkist_data', 50, 3, 10, 10, '2025-09-20')
+    # Only the first three chunks get written before the process dies
+    chunks = [(index, chunk) for index, chunk in rows if index < 3]
+    load_table(sqlite_source, 'sunkist_data', chunks, Checkpoint(path, load), concurrency=1)
+
+    resumed = Checkpoint(path, load)
+    assert resumed.done == {0, 1, 2}
+    assert load_table(sqlite_source, 'sunkist_data', synthetic_rows('sunkist_data', 50, 3, 10, 10, '2025-09-20'),
+                      resumed) == 20
+    assert count(sqlite_source) == 50
+
+def test_resuming_keeps_the_saved_anchor(tmp_path):
+    path = str(tmp_path / 'load.json')
+    Checkpoint(path, {'synthetic': 50}, anchor='2025-09-20').mark(0)
+    # Resumed the next day: the rows must still be generated back from the first day
+    assert Checkpoint(path, {'synthetic': 50}, anchor='2025-09-21').anchor == '2025-09-20'
+    with open(path) as f:
+        assert json.load(f)['anchor'] == '2025-09-20'
+
+def test_a_checkpoint_for_another_load_is_refused(tmp_path):
+    path = str(tmp_path / 'load.json')
+    Checkpoint(path, {'synthetic': 50, 'seed': 1}).mark(0)
+    with pytest.raises(ValueError, match='different load'):
+        Checkpoint(path, {'synthetic': 50, 'seed': 2})
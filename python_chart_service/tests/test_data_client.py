@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+import data_client
+from data_client import CircuitBreaker, CircuitOpenError, SingleFlight
+
+class BackendDown(Exception):
+    pass
+
+def fail():
+    raise BackendDown("backend down")
+
+def is_failure(exc):
+    return isinstance(exc, BackendDown)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(data_client.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        with pytest.raises(BackendDown):
+            breaker.call(fail, is_failure)
+    assert breaker.state == 'closed'
+    with pytest.raises(BackendDown):
+        breaker.call(fail, is_failure)
+    assert breaker.state == 'open'
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: calls.append(1), is_failure)
+    assert calls == []
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    with pytest.raises(BackendDown):
+        breaker.call(fail, is_failure)
+    assert breaker.call(lambda: 'ok', is_failure) == 'ok'
+    with pytest.raises(BackendDown):
+        breaker.call(fail, is_failure)
+    assert breaker.state == 'closed'
+
+def test_errors_that_are_not_backend_failures_do_not_count(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    with pytest.raises(KeyError):
+        breaker.call(lambda: {}['missing'], is_failure)
+    assert breaker.state == 'closed'
+
+def test_half_open_trial_closes_or_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    with pytest.raises(BackendDown):
+        breaker.call(fail, is_failure)
+    clock[0] += 30
+    assert breaker.state == 'half_open'
+    with pytest.raises(BackendDown):
+        breaker.call(fail, is_failure)
+    assert breaker.state == 'open'
+
+    clock[0] += 30
+    assert breaker.call(lambda: 'ok', is_failure) == 'ok'
+    assert breaker.state == 'closed'
+
+def test_only_one_trial_call_is_let_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    with pytest.raises(BackendDown):
+        breaker.call(fail, is_failure)
+    clock[0] += 30
+
+    def trial():
+        # A second call while the trial is running is short-circuited
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: 'second', is_failure)
+        return 'trial'
+
+    assert breaker.call(trial, is_failure) == 'trial'
+
+def run_concurrently(flight, key, fn, callers):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'rows'
+
+    threads, results, errors = run_concurrently(flight, 'key', slow, 1)
+    started.wait(5)
+    followers, follower_results, _ = run_concurrently(flight, 'key', slow, 4)
+    deadline = time.monotonic() + 5
+    while flight.shared < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads + followers:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results + follower_results == ['rows'] * 5
+    assert flight.shared == 4
+    assert errors == []
+
+def test_single_flight_shares_exceptions_and_forgets_the_key():
+    flight = SingleFlight()
+    with pytest.raises(BackendDown):
+        flight.do('key', fail)
+    # The key is released, so the next call runs again
+    assert flight.do('key', lambda: 'fresh') == 'fresh'
+
+def test_single_flight_keys_are_independent():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.shared == 0
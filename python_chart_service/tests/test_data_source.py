@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from benchmark import InMemorySupabase, generate_table
+from conftest import scan_rows
+from data_source import SupabaseDataSource
+
+def in_memory_source(rows):
+    columns = {key: np.array([row[key] for row in rows]) for key in rows[0]}
+    return SupabaseDataSource('http://in-memory', 'key', client=InMemorySupabase({'sunkist_data': columns}))
+
+@pytest.fixture(params=['sqlite', 'in_memory'])
+def source(request, sqlite_source):
+    rows = scan_rows(250)
+    # Ties on created_at, so pages must be broken by id
+    for row in rows[100:140]:
+        row['created_at'] = rows[100]['created_at']
+    if request.param == 'sqlite':
+        sqlite_source.replace_rows('sunkist_data', rows)
+        return sqlite_source
+    return in_memory_source(rows)
+
+def keys(pages, order_by='analyzed_at'):
+    return [(row[order_by], row['id']) for page in pages for row in page]
+
+@pytest.mark.parametrize('order_by', ['analyzed_at', 'created_at'])
+@pytest.mark.parametrize('page_size', [1, 7, 100, 250, 1000])
+def test_pages_cover_every_row_once_in_key_order(source, order_by, page_size):
+    pages = list(source.iter_pages('sunkist_data', ['ripeness_score'], page_size=page_size, order_by=order_by))
+    assert all(len(page) <= page_size for page in pages)
+    assert all(pages)
+    seen = keys(pages, order_by)
+    assert len(seen) == 250
+    assert len(set(seen)) == 250
+    assert seen == sorted(seen)
+
+def test_pages_resume_strictly_after_the_key(source):
+    everything = keys([source.fetch_rows('sunkist_data', ['ripeness_score'], page_size=1000)])
+    after = everything[119]
+    resumed = keys(source.iter_pages('sunkist_data', ['ripeness_score'], page_size=9, after=after))
+    assert resumed == everything[120:]
+
+def test_tied_keys_resume_by_id(source):
+    everything = keys([source.fetch_rows('sunkist_data', None, page_size=1000)], 'created_at')
+    after = everything[110]
+    resumed = keys(source.iter_pages('sunkist_data', None, page_size=4, order_by='created_at', after=after),
+                   'created_at')
+    assert resumed == everything[111:]
+
+def test_window_is_half_open(source):
+    rows = scan_rows(250)
+    start, end = rows[20]['analyzed_at'], rows[60]['analyzed_at']
+    fetched = source.fetch_rows('sunkist_data', ['ripeness_score'], start, end, page_size=6)
+    assert [row['analyzed_at'] for row in fetched] == [row['analyzed_at'] for row in rows[20:60]]
+
+def test_projection_keeps_the_page_key(source):
+    page = next(source.iter_pages('sunkist_data', ['ripeness_score'], page_size=5))
+    assert set(page[0]) == {'ripeness_score', 'analyzed_at', 'id'}
+
+def test_generated_benchmark_table_pages_in_order():
+    source = SupabaseDataSource('http://in-memory', 'key', client=InMemorySupabase({'bench_data': generate_table(500)}))
+    seen = keys(source.iter_pages('bench_data', ['ripeness_score'], page_size=64))
+    assert len(seen) == 500
+    assert seen == sorted(seen)
+
+def test_sqlite_insert_stamps_missing_created_at(sqlite_source):
+    rows = scan_rows(3)
+    rows[0]['created_at'] = None
+    sqlite_source.insert_rows('sunkist_data', rows)
+    # Re-inserting the same ids is a no-op
+    sqlite_source.insert_rows('sunkist_data', rows)
+    fetched = sqlite_source.fetch_rows('sunkist_data', None)
+    assert len(fetched) == 3
+    assert all(row['created_at'] for row in fetched)
+    assert [row['created_at'] for row in fetched[1:]] == [row['created_at'] for row in rows[1:]]
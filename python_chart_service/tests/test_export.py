@@ -0,0 +1,76 @@
+import csv
+import gzip
+import io
+import json
+
+import pyarrow.parquet as pq
+import pytest
+
+import export
+from conftest import scan_rows
+from export import EXPORT_COLUMNS, export_chunks
+
+def pages(count, page_size):
+    rows = scan_rows(count)
+    return [rows[i:i + page_size] for i in range(0, count, page_size)]
+
+def read_csv(data):
+    return list(csv.DictReader(io.StringIO(data.decode())))
+
+def test_csv_has_one_header_and_the_derived_columns():
+    rows = read_csv(b''.join(export_chunks(pages(25, 10), 'csv')))
+    assert len(rows) == 25
+    assert list(rows[0]) == EXPORT_COLUMNS
+    assert rows[0]['day'] == '2025-09-01'
+    # Scores cycle through 0-15: 0 is very ripe, 1.7 * 5 = 8.5 unripe
+    assert float(rows[0]['shelf_life_days']) < float(rows[5]['shelf_life_days'])
+
+def test_an_empty_export_is_still_a_valid_file():
+    assert b''.join(export_chunks([], 'csv')).decode().strip() == ','.join(EXPORT_COLUMNS)
+    assert b''.join(export_chunks([], 'ndjson')) == b''
+
+def test_ndjson_is_one_record_per_line():
+    lines = b''.join(export_chunks(pages(12, 5), 'ndjson')).decode().splitlines()
+    assert len(lines) == 12
+    assert json.loads(lines[-1])['id'] == scan_rows(12)[-1]['id']
+
+def test_gzip_is_streamed_a_page_at_a_time():
+    chunks = list(export_chunks(pages(30, 10), 'csv', gzip=True))
+    assert len(read_csv(gzip.decompress(b''.join(chunks)))) == 30
+
+def test_parquet_is_written_in_row_groups(monkeypatch):
+    monkeypatch.setattr(export, 'PARQUET_ROW_GROUP_ROWS', 20)
+    chunks = list(export_chunks(pages(50, 10), 'parquet'))
+    # Each finished row group is sent before the next is buffered
+    assert len([chunk for chunk in chunks if chunk]) >= 3
+    parquet = pq.ParquetFile(io.BytesIO(b''.join(chunks)))
+    assert parquet.metadata.num_rows == 50
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column_names == EXPORT_COLUMNS
+    assert str(table.schema.field('analyzed_at').type) == 'timestamp[us, tz=UTC]'
+
+def test_export_route_streams_the_supplier_table(app_client):
+    response = app_client.get('/supplier_export/sunkist@example.com?start=2025-09-02&end=2025-09-03')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="sunkist_data.csv"'
+    rows = read_csv(response.get_data())
+    assert len(rows) == 144
+    assert {row['day'] for row in rows} == {'2025-09-02'}
+
+def test_export_route_gzips_for_clients_that_accept_it(app_client):
+    response = app_client.get('/supplier_export/sunkist@example.com?format=ndjson',
+                              headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(gzip.decompress(response.get_data()).splitlines()) == 300
+
+@pytest.mark.parametrize('url, status', [
+    ('/supplier_export/sunkist@example.com?format=xlsx', 400),
+    ('/supplier_export/sunkist@example.com?start=yesterday', 400),
+    # Exports never fall back to halos_data
+    ('/supplier_export/nobody@example.com', 404),
+])
+def test_bad_exports_are_rejected(app_client, url, status):
+    assert app_client.get(url).status_code == status
@@ -0,0 +1,79 @@
+import uuid
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecast as forecast_module
+from aggregate_store import frame_rollups
+from conftest import BASE_TIME
+from forecast import EXPIRY_DAYS, fit_model, forecast
+from scan_frame import load_scan_frame
+
+def rollups(scores_by_day, per_day=12):
+    """Daily rollups of per_day scans a day with the given score"""
+    rows = []
+    for day, score in enumerate(scores_by_day):
+        for n in range(per_day):
+            analyzed_at = BASE_TIME + timedelta(days=day, hours=2 * n)
+            rows.append({'id': str(uuid.UUID(int=len(rows) + 1)), 'ripeness_score': score,
+                         'analyzed_at': analyzed_at.isoformat(timespec='microseconds')})
+    return frame_rollups(load_scan_frame(rows))
+
+def test_a_steady_history_forecasts_more_of_the_same():
+    model = fit_model(rollups([9.0] * 30))
+    assert model['last_day'] == '2025-09-30'
+    frame = forecast(model, 7)
+    assert frame.index[0] == pd.Timestamp('2025-10-01', tz='UTC')
+    assert np.allclose(frame['average_ripeness'], 9.0)
+    assert np.allclose(frame['expected_scans'], 12.0)
+    assert np.allclose(frame['unripe_share'], 1.0)
+
+def test_trends_are_damped_and_kept_on_the_scale():
+    frame = forecast(fit_model(rollups(np.linspace(2, 14, 30).round(2))), 60)
+    ripeness = frame['average_ripeness'].to_numpy()
+    assert np.all(np.diff(ripeness) >= 0)
+    # A straight line would be past 15 within two weeks; damping levels it off
+    assert ripeness.max() <= 15
+    assert ripeness[-1] - ripeness[-2] < ripeness[1] - ripeness[0]
+
+def test_days_without_scans_are_skipped_not_zeroed():
+    scores = [6.0] * 20
+    daily = rollups(scores).drop(pd.Timestamp('2025-09-10', tz='UTC'))
+    assert np.allclose(forecast(fit_model(daily), 3)['average_ripeness'], 6.0)
+
+def test_scans_in_stock_expire_by_band():
+    model = fit_model(rollups([1.0] * 10))
+    model['volume'].update(level=[0.0], trend=[0.0])
+    frame = forecast(model, 10)
+    # Only the last days' very ripe scans are left, each expiring EXPIRY_DAYS[0] days after it arrived
+    assert frame['expiring'].sum() == 12 * EXPIRY_DAYS[0]
+    assert frame['cumulative_expiring'].iloc[-1] == frame['expiring'].sum()
+
+def test_a_later_start_projects_through_the_gap():
+    model = fit_model(rollups([9.0] * 10))
+    frame = forecast(model, 5, pd.Timestamp('2025-10-01', tz='UTC'))
+    assert frame.index[0] == pd.Timestamp('2025-10-01', tz='UTC')
+    assert len(frame) == 5
+
+def test_forecast_route_starts_today(app_client):
+    import chart_generator
+
+    series = app_client.get('/supplier_forecast/sunkist@example.com?format=series&days=5').get_json()
+    assert len(series['date']) == 5
+    assert series['date'][0] == chart_generator.utc_today()
+
+def test_fitted_models_are_reused(app_client, monkeypatch):
+    app_client.get('/supplier_forecast/sunkist@example.com?format=series&days=3')
+
+    def fail(daily):
+        raise AssertionError("model refitted")
+
+    monkeypatch.setattr(forecast_module, 'fit_model', fail)
+    response = app_client.get('/supplier_forecast/sunkist@example.com?format=series&days=4')
+    assert response.status_code == 200
+
+@pytest.mark.parametrize('query', ['days=0', 'days=61', 'days=soon', 'start=2025-09-01'])
+def test_bad_forecasts_are_rejected(app_client, query):
+    assert app_client.get(f'/supplier_forecast/sunkist@example.com?{query}').status_code == 400
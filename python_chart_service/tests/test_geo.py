@@ -0,0 +1,20 @@
+import pytest
+
+from geo import cell_index, snap_bbox
+
+@pytest.mark.parametrize('bbox, size, snapped', [
+    ((-120, 33, -117, 37), 0.01, (-120.0, 33.0, -117.0, 37.0)),
+    ((-120.005, 33.004, -117.001, 37.0001), 0.01, (-120.01, 33.0, -117.0, 37.01)),
+    ((34.05, 34.05, 34.06, 34.07), 0.01, (34.05, 34.05, 34.06, 34.07)),
+    ((-75.3, 39.9, -75.1, 40.1), 0.05, (-75.3, 39.9, -75.1, 40.1)),
+    ((-75.31, 39.91, -75.11, 40.09), 0.05, (-75.35, 39.9, -75.1, 40.1)),
+])
+def test_snap_bbox_grows_only_unaligned_edges(bbox, size, snapped):
+    assert snap_bbox(bbox, size) == snapped
+
+def test_snapping_is_idempotent():
+    once = snap_bbox((-118.2437, 33.9425, -117.2297, 36.7378), 0.05)
+    assert snap_bbox(once, 0.05) == once
+
+def test_cell_edges_belong_to_the_cell_above():
+    assert cell_index([34.05, 34.0499999, -0.01], 0.01).tolist() == [3405, 3404, -1]
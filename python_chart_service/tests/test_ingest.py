@@ -0,0 +1,216 @@
+import os
+import uuid
+
+import pytest
+
+from ingest import QueueFull, WriteBehindQueue, validate_record
+
+def record(**fields):
+    return dict({'ripeness_score': 7.25, 'analyzed_at': '2025-09-01T12:00:00Z'}, **fields)
+
+def test_valid_record_is_normalized():
+    row = validate_record(record(latitude=34.05, longitude=-118.24, fruit_type='Orange'))
+    assert uuid.UUID(row['id'])
+    assert row['analyzed_at'] == '2025-09-01T12:00:00.000000+00:00'
+    assert row['ripeness_score'] == 7.25
+    assert row['location_description'] is None
+    assert 'created_at' not in row
+
+def test_offsets_are_converted_to_utc():
+    row = validate_record(record(analyzed_at='2025-09-01T08:00:00-04:00'))
+    assert row['analyzed_at'] == '2025-09-01T12:00:00.000000+00:00'
+
+def test_naive_timestamps_are_taken_as_utc():
+    assert validate_record(record(analyzed_at='2025-09-01T12:00:00'))['analyzed_at'].endswith('+00:00')
+
+def test_given_ids_are_kept():
+    row_id = str(uuid.uuid4())
+    assert validate_record(record(id=row_id))['id'] == row_id
+
+@pytest.mark.parametrize('bad, message', [
+    ([], 'JSON object'),
+    (record(color='orange'), 'Unknown columns: color'),
+    (record(created_at='2025-09-01T12:00:00Z'), 'created_at'),
+    (record(id='not-a-uuid'), "'id' must be a UUID"),
+    ({'ripeness_score': 5}, "'analyzed_at' is required"),
+    (record(analyzed_at='yesterday'), 'Invalid'),
+    ({'analyzed_at': '2025-09-01T12:00:00Z'}, "'ripeness_score' is required"),
+    (record(ripeness_score=15.5), 'between 0 and 15'),
+    (record(ripeness_score=True), 'must be a number'),
+    (record(ripeness_score=float('nan')), 'must be a number'),
+    (record(latitude=91), 'between -90 and 90'),
+    (record(longitude='-118'), 'must be a number'),
+    (record(fruit_type='x' * 501), 'at most 500'),
+])
+def test_invalid_records_are_rejected(bad, message):
+    with pytest.raises(ValueError, match=message):
+        validate_record(bad)
+
+def rows(count):
+    return [validate_record(record()) for _ in range(count)]
+
+def crash(queue):
+    """Stop a queue's flusher without flushing and release its spool, as a dead process would"""
+    queue._stop.set()
+    with queue._lock:
+        queue._lock.notify_all()
+    queue._thread.join()
+    queue._owner_lock.close()
+
+def idle_queue(source, spool_dir, **options):
+    # Nothing is flushed unless asked to
+    return WriteBehindQueue(source, spool_dir, batch_size=10_000, flush_interval=3600, **options)
+
+def test_flush_writes_buffered_rows_and_clears_the_spool(sqlite_source, tmp_path):
+    flushed = []
+    queue = idle_queue(sqlite_source, str(tmp_path / 'spool'), on_flush=lambda table, latest: flushed.append(table))
+    queue.submit('sunkist_data', rows(5))
+    assert queue.queued == 5
+    assert queue.flush() == 5
+    assert queue.queued == 0
+    assert flushed == ['sunkist_data']
+    assert len(sqlite_source.fetch_rows('sunkist_data', None)) == 5
+    queue.stop()
+    assert os.listdir(tmp_path / 'spool') == []
+
+def test_spooled_rows_are_replayed_after_a_crash(sqlite_source, tmp_path):
+    spool = str(tmp_path / 'spool')
+    crashed = idle_queue(sqlite_source, spool)
+    crashed.submit('sunkist_data', rows(3))
+    crashed.submit('halos_data', rows(2))
+    crash(crashed)
+
+    queue = idle_queue(sqlite_source, spool)
+    queue.start()
+    assert queue.queued == 5
+    queue.stop()
+    assert len(sqlite_source.fetch_rows('sunkist_data', None)) == 3
+    assert len(sqlite_source.fetch_rows('halos_data', None)) == 2
+    assert os.listdir(spool) == []
+
+def test_replay_skips_a_torn_last_line(sqlite_source, tmp_path):
+    spool = str(tmp_path / 'spool')
+    crashed = idle_queue(sqlite_source, spool)
+    crashed.submit('sunkist_data', rows(2))
+    with open(crashed._spool.name, 'a') as f:
+        f.write('{"table": "sunkist_data", "row": {"id"')
+    crash(crashed)
+
+    queue = idle_queue(sqlite_source, spool)
+    queue.start()
+    assert queue.queued == 2
+    queue.stop()
+
+def test_running_owners_are_not_adopted(sqlite_source, tmp_path):
+    spool = str(tmp_path / 'spool')
+    running = idle_queue(sqlite_source, spool)
+    running.submit('sunkist_data', rows(2))
+    other = idle_queue(sqlite_source, spool)
+    other.start()
+    assert other.queued == 0
+    other.stop()
+    running.stop()
+    assert len(sqlite_source.fetch_rows('sunkist_data', None)) == 2
+
+def test_replayed_rows_are_not_inserted_twice(sqlite_source, tmp_path):
+    spool = str(tmp_path / 'spool')
+    crashed = idle_queue(sqlite_source, spool)
+    batch = rows(4)
+    crashed.submit('sunkist_data', batch)
+    # Written, but the process died before the spool segment was deleted
+    sqlite_source.insert_rows('sunkist_data', batch)
+    crash(crashed)
+
+    queue = idle_queue(sqlite_source, spool)
+    queue.start()
+    queue.stop()
+    assert len(sqlite_source.fetch_rows('sunkist_data', None)) == 4
+
+class FailingSource:
+    """Source whose backend is down for some tables and rejects the rows of others"""
+
+    def __init__(self, sqlite_source, down=(), rejects=()):
+        self.sqlite_source = sqlite_source
+        self.down = set(down)
+        self.rejects = set(rejects)
+
+    def insert_rows(self, table_name, rows):
+        if table_name in self.down:
+            raise ConnectionError("backend down")
+        if table_name in self.rejects:
+            raise ValueError("column does not exist")
+        self.sqlite_source.insert_rows(table_name, rows)
+
+    def is_backend_error(self, exc):
+        return isinstance(exc, ConnectionError)
+
+def spooled_rows(spool):
+    """Rows left in spool segments, dead letters aside"""
+    count = 0
+    for root, dirs, files in os.walk(spool):
+        dirs[:] = [name for name in dirs if name != 'dead-letter']
+        for name in files:
+            if name.endswith('.jsonl'):
+                with open(os.path.join(root, name)) as f:
+                    count += len(f.readlines())
+    return count
+
+def test_failed_flush_keeps_rows_spooled(sqlite_source, tmp_path):
+    spool = str(tmp_path / 'spool')
+    queue = idle_queue(FailingSource(sqlite_source, down={'sunkist_data'}), spool)
+    queue.submit('sunkist_data', rows(3))
+    with pytest.raises(ConnectionError):
+        queue.flush()
+    assert queue.queued == 3
+    assert queue.counts['failed_flushes'] == 1
+    queue.stop()
+    assert spooled_rows(spool) == 3
+
+def test_one_failing_table_does_not_hold_up_the_others(sqlite_source, tmp_path):
+    spool = str(tmp_path / 'spool')
+    source = FailingSource(sqlite_source, down={'sunkist_data'})
+    flushed = []
+    queue = idle_queue(source, spool, on_flush=lambda table, latest: flushed.append(table))
+    queue.submit('sunkist_data', rows(3))
+    queue.submit('halos_data', rows(2))
+    with pytest.raises(ConnectionError):
+        queue.flush()
+    assert flushed == ['halos_data']
+    assert len(sqlite_source.fetch_rows('halos_data', None)) == 2
+    assert queue.queued == 3
+    assert spooled_rows(spool) == 3
+
+    # The backend is back: only the kept rows are written
+    source.down.clear()
+    assert queue.flush() == 3
+    assert len(sqlite_source.fetch_rows('sunkist_data', None)) == 3
+    queue.stop()
+    assert os.listdir(spool) == []
+
+def test_rejected_rows_are_dead_lettered_not_retried(sqlite_source, tmp_path):
+    spool = tmp_path / 'spool'
+    queue = idle_queue(FailingSource(sqlite_source, rejects={'sunkist_data'}), str(spool))
+    queue.submit('sunkist_data', rows(4))
+    queue.submit('halos_data', rows(1))
+    assert queue.flush() == 1
+    assert queue.queued == 0
+    assert queue.counts['dead_lettered'] == 4
+    assert queue.counts['failed_flushes'] == 0
+    dead_letters = os.listdir(spool / 'dead-letter')
+    assert len(dead_letters) == 1 and dead_letters[0].startswith('sunkist_data-')
+    assert len((spool / 'dead-letter' / dead_letters[0]).read_text().splitlines()) == 4
+    queue.stop()
+
+    # A later process doesn't replay them
+    queue = idle_queue(sqlite_source, str(spool))
+    queue.start()
+    assert queue.queued == 0
+    queue.stop()
+
+def test_full_queue_refuses_more_rows(sqlite_source, tmp_path):
+    queue = idle_queue(sqlite_source, str(tmp_path / 'spool'), max_queued=4)
+    queue.submit('sunkist_data', rows(3))
+    with pytest.raises(QueueFull):
+        queue.submit('sunkist_data', rows(2))
+    assert queue.queued == 3
+    queue.stop()
@@ -0,0 +1,79 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from aggregate_store import AggregateStore
+from conftest import scan_rows
+from leaderboard import RANKING_PERIODS, LeaderboardRefresher
+
+def brand_rows(score, count, days_ago=0):
+    """count scans with one score, spread over the hours before days_ago days ago"""
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(days=days_ago)
+    return [{
+        'id': str(uuid.uuid4()),
+        'ripeness_score': score,
+        'analyzed_at': (end - timedelta(hours=n + 1)).isoformat(timespec='microseconds'),
+    } for n in range(count)]
+
+@pytest.fixture
+def store(tmp_path, sqlite_source):
+    sqlite_source.insert_rows('sunkist_data', brand_rows(12.0, 10))
+    sqlite_source.insert_rows('halos_data', brand_rows(2.0, 30))
+    # Fresher than both, but only scanned a month ago
+    sqlite_source.insert_rows('dole_data', brand_rows(14.0, 5, days_ago=20))
+    return AggregateStore(str(tmp_path / 'aggregates.db'), sqlite_source)
+
+def refresher(store, tables=('dole_data', 'halos_data', 'sunkist_data')):
+    return LeaderboardRefresher(lambda: store, lambda: list(tables), store.refresh, interval=3600)
+
+def ranked(store, period, sort, limit=10, after=0):
+    rows, total = store.rankings(period, sort, limit, after)
+    return [row['table_name'] for row in rows], total
+
+def test_rankings_cover_each_period(store):
+    refresher(store).run_once()
+    assert ranked(store, '7d', 'ripeness') == (['sunkist_data', 'halos_data'], 2)
+    assert ranked(store, '30d', 'ripeness') == (['dole_data', 'sunkist_data', 'halos_data'], 3)
+    assert ranked(store, '30d', 'volume') == (['halos_data', 'sunkist_data', 'dole_data'], 3)
+    assert ranked(store, '30d', 'shelf_life_share')[0][-1] == 'halos_data'
+
+def test_rankings_are_paged_by_rank(store):
+    refresher(store).run_once()
+    assert ranked(store, '30d', 'ripeness', limit=2) == (['dole_data', 'sunkist_data'], 3)
+    assert ranked(store, '30d', 'ripeness', limit=2, after=2) == (['halos_data'], 3)
+
+def test_a_failing_table_is_ranked_on_its_last_rollups(store, sqlite_source):
+    refresher(store).run_once()
+    sqlite_source.insert_rows('sunkist_data', brand_rows(1.0, 100, days_ago=1))
+
+    def refresh(table_name):
+        raise ConnectionError("backend down")
+
+    LeaderboardRefresher(lambda: store, lambda: ['halos_data', 'sunkist_data'], refresh, 3600).run_once()
+    rows, _ = store.rankings('7d', 'ripeness', 10)
+    assert {row['table_name']: row['count'] for row in rows} == {'sunkist_data': 10, 'halos_data': 30}
+
+def test_disabled_leaderboard_is_not_built_on_request(app_client, monkeypatch):
+    import chart_generator
+
+    monkeypatch.setattr(chart_generator.get_aggregate_store(), 'rankings', lambda *args: ([], 0))
+    response = app_client.get('/leaderboard')
+    assert response.status_code == 404
+    assert chart_generator.leaderboard._thread is None
+
+def test_leaderboard_route_reads_the_materialized_rankings(app_client, monkeypatch):
+    import chart_generator
+
+    store = chart_generator.get_aggregate_store()
+    store.refresh('sunkist_data')
+    store.refresh_rankings(['sunkist_data'], RANKING_PERIODS, scan_rows(300)[-1]['analyzed_at'][:10])
+    body = app_client.get('/leaderboard?period=7d&sort=volume').get_json()
+    assert body['total'] == 1
+    assert body['next'] is None
+    (brand,) = body['brands']
+    assert (brand['rank'], brand['brand'], brand['total_analyses']) == (1, 'sunkist', 300)
+
+@pytest.mark.parametrize('query', ['period=2d', 'sort=name', 'limit=0', 'limit=101', 'after=-1', 'limit=ten'])
+def test_bad_leaderboard_queries_are_rejected(app_client, query):
+    assert app_client.get(f'/leaderboard?{query}').status_code == 400
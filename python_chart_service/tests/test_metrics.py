@@ -0,0 +1,74 @@
+import threading
+
+from metrics import Registry, collect_spans, end_spans, propagate, stage, start_spans
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests', ('route', 'status'))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    registry.gauge('queued', 'Queued rows', lambda: {(): 3})
+    requests.inc('/a"b', '200')
+    latency.observe(0.5)
+
+    lines = registry.expose().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{route="/a\\"b",status="200"} 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 0' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in lines
+    assert 'latency_seconds_count 1' in lines
+    assert 'queued 3' in lines
+
+def test_stages_add_up_per_request_and_are_shared_with_worker_threads():
+    with stage('fetch'):
+        pass  # Outside a request: nothing to record
+
+    token = start_spans()
+    with stage('fetch'):
+        pass
+    def work():
+        with stage('aggregate'):
+            pass
+
+    worker = threading.Thread(target=propagate(work))
+    worker.start()
+    worker.join()
+    with stage('fetch'):
+        pass
+    spans = end_spans(token)
+    assert set(spans.seconds) == {'fetch', 'aggregate'}
+
+def test_collect_spans_returns_the_timings_of_a_call():
+    def render():
+        with stage('render'):
+            return b'chart'
+
+    result, seconds = collect_spans(render)
+    assert result == b'chart'
+    assert set(seconds) == {'render'}
+
+def test_responses_carry_server_timing(app_client):
+    # A window no other test asks for, so nothing is cached
+    response = app_client.get('/supplier_summary/sunkist@example.com?start=2025-09-02T03:00:00Z')
+    assert response.status_code == 200
+    timings = dict(part.split(';dur=') for part in response.headers['Server-Timing'].split(', '))
+    assert {'fetch', 'parse', 'aggregate', 'total'} <= set(timings)
+
+def test_metrics_endpoint_counts_requests_by_route(app_client):
+    app_client.get('/health')
+    body = app_client.get('/metrics').get_data(as_text=True)
+    assert 'chart_requests_total{route="/health",status="200"}' in body
+    assert 'chart_request_duration_seconds_bucket{route="/health",le="+Inf"}' in body
+    assert '# TYPE chart_ingest_total counter' in body
+
+def test_profiled_requests_return_profile_stats(app_client, monkeypatch):
+    import chart_generator
+
+    url = '/generate_shelf_life_chart/sunkist@example.com?format=series&profile=1'
+    assert app_client.get(url).is_json
+    monkeypatch.setattr(chart_generator, 'PROFILING_ENABLED', True)
+    response = app_client.get(url)
+    assert response.mimetype == 'text/plain'
+    report = response.get_data(as_text=True)
+    assert report.startswith('GET /generate_shelf_life_chart/sunkist@example.com')
+    assert 'cumulative' in report
@@ -0,0 +1,97 @@
+import pytest
+
+from precompute import DemandTracker, Precomputer
+
+def test_scores_decay_with_the_half_life():
+    tracker = DemandTracker(half_life=60)
+    for _ in range(4):
+        tracker.record('old', now=0)
+    tracker.record('new', now=120)
+    # 4 requests two half-lives ago are worth 1 now
+    tracker.record('new', now=120)
+    assert tracker.top(2, now=120) == ['new', 'old']
+
+def test_the_coldest_key_is_dropped_when_full():
+    tracker = DemandTracker(half_life=60, max_entries=2)
+    tracker.record('a', now=0)
+    tracker.record('a', now=0)
+    tracker.record('b', now=0)
+    tracker.record('c', now=0)
+    assert len(tracker) == 2
+    assert 'a' in tracker.top(2, now=0)
+
+class Recorder:
+    def __init__(self, versions):
+        self.versions = versions
+        self.warmed = []
+
+    def version(self, key):
+        return self.versions[key]
+
+    def warm(self, key):
+        self.warmed.append(key)
+
+def precomputer(versions, busy=lambda: False, refresh_after=3600):
+    tracker = DemandTracker(half_life=60)
+    for key in versions:
+        tracker.record(key)
+    recorder = Recorder(versions)
+    return Precomputer(tracker, recorder.version, recorder.warm, top_n=10, interval=60,
+                       refresh_after=refresh_after, cpu_share=1.0, busy=busy), recorder
+
+def test_keys_are_warmed_again_only_when_their_version_changes():
+    versions = {'a': (10, 'x'), 'b': (20, 'y')}
+    runner, recorder = precomputer(versions)
+    assert runner.run_once() == 2
+    assert runner.run_once() == 0
+    versions['a'] = (11, 'x')
+    assert runner.run_once() == 1
+    assert sorted(recorder.warmed) == ['a', 'a', 'b']
+
+def test_keys_without_a_version_are_not_warmed():
+    runner, recorder = precomputer({'a': None})
+    assert runner.run_once() == 0
+    assert recorder.warmed == []
+
+def test_warming_waits_while_the_renderer_is_busy():
+    runner, recorder = precomputer({'a': (1, 'x')}, busy=lambda: True)
+    assert runner.run_once() == 0
+    assert runner.counts['skipped'] == 1
+
+def test_failures_are_counted_and_retried():
+    runner, recorder = precomputer({'a': (1, 'x')})
+    runner.warm = lambda key: 1 / 0
+    assert runner.run_once() == 0
+    assert runner.counts['failed'] == 1
+    runner.warm = recorder.warm
+    assert runner.run_once() == 1
+
+@pytest.fixture
+def generator(app_client):
+    import chart_generator
+
+    return chart_generator
+
+def summary_key(generator):
+    with generator.app.test_request_context('/supplier_summary/sunkist@example.com'):
+        return generator.demand_key()
+
+def test_demand_version_changes_with_the_day(generator, monkeypatch):
+    key = summary_key(generator)
+    monkeypatch.setattr(generator, 'utc_today', lambda: '2025-09-20')
+    today = generator.demand_version(key)
+    monkeypatch.setattr(generator, 'utc_today', lambda: '2025-09-21')
+    assert generator.demand_version(key) != today
+    assert today[:2] == generator.get_data_fingerprint('sunkist_data')[1]
+
+def test_warmed_summaries_are_served_from_the_cache(generator, app_client, monkeypatch):
+    generator.warm_request(summary_key(generator))
+
+    def fail(*args):
+        raise AssertionError("summary recomputed")
+
+    monkeypatch.setattr(generator, 'get_daily_rollups', fail)
+    monkeypatch.setattr(generator, 'load_chart_frame', fail)
+    response = app_client.get('/supplier_summary/sunkist@example.com')
+    assert response.status_code == 200
+    assert response.get_json()['total_analyses'] == 300
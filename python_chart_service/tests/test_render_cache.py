@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+import render_cache
+from conftest import scan_rows
+from data_source import SQLiteDataSource
+from render_cache import RenderCache, make_cache_key
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache"""
+    now = [1000.0]
+    monkeypatch.setattr(render_cache.time, 'time', lambda: now[0])
+    return now
+
+def test_cache_key_is_stable_and_covers_every_part():
+    key = make_cache_key('ripeness', 'sunkist_data', None, None, 'png', 150, (500, '2025-09-01'))
+    assert key == make_cache_key('ripeness', 'sunkist_data', None, None, 'png', 150, (500, '2025-09-01'))
+    assert key != make_cache_key('ripeness', 'sunkist_data', None, None, 'png', 150, (501, '2025-09-01'))
+    assert key != make_cache_key('ripeness', 'sunkist_data', None, None, 'webp', 150, (500, '2025-09-01'))
+
+def test_least_recently_used_entries_are_evicted_by_size(clock):
+    cache = RenderCache(max_bytes=10, ttl=60)
+    cache.put('a', b'aaaa')
+    cache.put('b', b'bbbb')
+    assert cache.get('a') == b'aaaa'  # a is now the most recently used
+    cache.put('c', b'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'aaaa'
+    assert cache.get('c') == b'cccc'
+    assert cache.stats()['bytes'] == 8
+
+def test_payloads_larger_than_the_budget_are_not_kept(clock):
+    cache = RenderCache(max_bytes=4, ttl=60)
+    cache.put('big', b'x' * 5)
+    assert cache.get('big') is None
+    assert cache.stats()['entries'] == 0
+
+def test_replacing_a_key_keeps_the_size_right(clock):
+    cache = RenderCache(max_bytes=100, ttl=60)
+    cache.put('a', b'x' * 10)
+    cache.put('a', b'x' * 3)
+    assert cache.stats() == {'entries': 1, 'bytes': 3, 'hits': 0, 'misses': 0}
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = RenderCache(max_bytes=100, ttl=60)
+    cache.put('a', b'payload')
+    clock[0] += 59
+    assert cache.get('a') == b'payload'
+    clock[0] += 1
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+def test_disk_tier_survives_a_new_cache_and_expires(clock, tmp_path):
+    RenderCache(max_bytes=100, ttl=60, disk_dir=str(tmp_path)).put('a', b'payload')
+    path = tmp_path / 'a.bin'
+    os.utime(path, (clock[0], clock[0]))
+    fresh = RenderCache(max_bytes=100, ttl=60, disk_dir=str(tmp_path))
+    assert fresh.get('a') == b'payload'
+
+    clock[0] += 60
+    assert RenderCache(max_bytes=100, ttl=60, disk_dir=str(tmp_path)).get('a') is None
+    assert not path.exists()
+
+def test_chart_etag_revalidates_with_a_304(app_client):
+    url = '/generate_shelf_life_chart/sunkist@example.com'
+    first = app_client.get(url)
+    assert first.status_code == 200
+    assert first.mimetype == 'image/png'
+    etag = first.headers['ETag']
+
+    again = app_client.get(url, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert app_client.get(url, headers={'If-None-Match': '"stale"'}).status_code == 200
+
+    # Another format is another entity
+    webp = app_client.get(url + '?format=webp')
+    assert webp.mimetype == 'image/webp'
+    assert webp.headers['ETag'] != etag
+
+def test_rollup_charts_are_drawn_from_the_rows_their_etag_describes(app_client):
+    import chart_generator
+
+    source = SQLiteDataSource(os.environ['CHART_DATA_PATH'])
+    source.replace_rows('dole_data', scan_rows(300))
+    chart_generator.table_registry.invalidate()
+    url = '/generate_shelf_life_chart/dole@example.com?format=series'
+    first = app_client.get(url)
+    assert first.get_json()['date'][-1] == '2025-09-03'
+
+    # Written straight to the table, within the rollup refresh interval
+    source.insert_rows('dole_data', scan_rows(200, offset=300))
+    chart_generator._fingerprints.clear()
+    second = app_client.get(url)
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.get_json()['date'][-1] == '2025-09-04'
+
+@pytest.mark.parametrize('accept, mimetype', [
+    ('image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8', 'image/png'),
+    ('application/json, text/plain, */*', 'image/png'),
+    ('image/webp', 'image/webp'),
+])
+def test_accept_only_picks_a_single_named_image_type(app_client, accept, mimetype):
+    response = app_client.get('/generate_shelf_life_chart/sunkist@example.com', headers={'Accept': accept})
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+
+def test_series_needs_an_explicit_format(app_client):
+    response = app_client.get('/generate_shelf_life_chart/sunkist@example.com?format=series')
+    assert response.status_code == 200
+    assert response.is_json
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from render_pool import RenderPool, RenderPoolBusy, RenderTimeout
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+def test_jobs_beyond_the_queue_are_turned_away():
+    pool = RenderPool(workers=0, queue_size=1, timeout=5)
+    release = threading.Event()
+    results = []
+
+    def slow():
+        release.wait(5)
+        return b'chart'
+
+    # One job renders and one waits its turn; a third has no slot
+    threads = [threading.Thread(target=lambda: results.append(pool.render(slow))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: pool.in_flight == 2)
+    assert pool.busy
+    with pytest.raises(RenderPoolBusy):
+        pool.render(lambda: b'chart')
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [b'chart', b'chart']
+    assert pool.in_flight == 0
+    assert pool.render(lambda: b'again') == b'again'
+
+def test_a_failed_render_frees_its_slot():
+    pool = RenderPool(workers=0, queue_size=0, timeout=5)
+    with pytest.raises(ZeroDivisionError):
+        pool.render(lambda: 1 / 0)
+    assert pool.in_flight == 0
+    assert pool.render(lambda: b'chart') == b'chart'
+
+@pytest.mark.parametrize('error, message', [
+    (RenderPoolBusy, 'busy'),
+    (RenderTimeout, 'timed out'),
+])
+def test_render_failures_are_answered_with_a_503(app_client, monkeypatch, error, message):
+    import chart_generator
+
+    def fail(render, *args):
+        raise error()
+
+    monkeypatch.setattr(chart_generator.render_pool, 'render', fail)
+    # A resolution nothing else asks for, so the chart isn't cached
+    response = app_client.get('/generate_shelf_life_chart/sunkist@example.com?dpi=41')
+    assert response.status_code == 503
+    assert message in response.get_json()['error']
+    if error is RenderPoolBusy:
+        assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from scan_frame import HISTOGRAM_BIN_WIDTH, HISTOGRAM_BINS, histogram_bins, histogram_quantiles, lttb
+
+def histogram(scores):
+    return np.bincount(histogram_bins(scores), minlength=HISTOGRAM_BINS)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_histogram_quantiles_are_within_a_bin_of_the_exact_percentile(seed):
+    scores = np.random.default_rng(seed).uniform(0, 15, 2000).round(2)
+    quantiles = (0.1, 0.5, 0.9)
+    estimated = histogram_quantiles(histogram(scores), quantiles)
+    exact = np.quantile(scores, quantiles)
+    assert np.all(np.abs(np.array(estimated) - exact) <= HISTOGRAM_BIN_WIDTH)
+
+def test_histogram_quantiles_of_one_value():
+    counts = histogram(np.full(10, 7.25))
+    low, median, high = histogram_quantiles(counts, (0.0, 0.5, 1.0))
+    assert 7.2 <= low <= median <= high <= 7.3 + 1e-9
+
+def test_histogram_quantiles_skip_empty_bins():
+    counts = histogram([1.0, 1.0, 14.0, 14.0])
+    low, high = histogram_quantiles(counts, (0.0, 1.0))
+    assert low == pytest.approx(1.0)
+    assert high == pytest.approx(14.1)
+
+def test_histogram_quantiles_of_nothing():
+    assert histogram_quantiles(np.zeros(HISTOGRAM_BINS, dtype=int), (0.1, 0.5)) == [None, None]
+
+def test_out_of_scale_scores_go_to_the_end_bins():
+    assert histogram_bins([-1, 0, 14.99, 15, 20]).tolist() == [0, 0, 149, 149, 149]
+
+def test_lttb_keeps_everything_below_the_threshold():
+    x = np.arange(10.0)
+    assert lttb(x, x, 10).tolist() == list(range(10))
+    assert lttb(x, x, 2).tolist() == list(range(10))
+
+def test_lttb_keeps_the_ends_and_threshold_points_in_order():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000.0)
+    y = rng.normal(size=1000)
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+
+def test_lttb_keeps_spikes():
+    x = np.arange(500.0)
+    y = np.zeros(500)
+    y[123], y[377] = 10, -10
+    keep = lttb(x, y, 20)
+    assert 123 in keep
+    assert 377 in keep
+
+def ripeness(app_client, query):
+    response = app_client.get(f'/generate_ripeness_chart/sunkist@example.com?format=series&{query}')
+    assert response.status_code == 200
+    return response
+
+def test_auto_lod_keeps_every_scan_that_fits_the_width(app_client):
+    # 12in at 150 dpi leaves room for 900 points
+    series = ripeness(app_client, 'dpi=150').get_json()
+    assert series['lod'] == 'raw'
+    assert len(series['ripeness_score']) == 300
+
+def test_auto_lod_aggregates_when_the_chart_is_narrow(app_client):
+    # 240 pixels: 120 points or buckets at most
+    series = ripeness(app_client, 'dpi=20').get_json()
+    assert series['lod'] == 'hour'
+    assert len(series['ripeness_score']) <= 120
+    assert sum(series['count']) == 300
+    assert all(low <= high for low, high in zip(series['min'], series['max']))
+
+@pytest.mark.parametrize('lod, level', [('raw', 'raw'), ('lttb', 'lttb'), ('bands', 'hour')])
+def test_lod_can_be_chosen(app_client, lod, level):
+    series = ripeness(app_client, f'dpi=20&lod={lod}').get_json()
+    assert series['lod'] == level
+    assert len(series['ripeness_score']) == (300 if lod == 'raw' else 120 if lod == 'lttb' else 50)
+
+def test_each_lod_is_cached_separately(app_client):
+    etags = {ripeness(app_client, f'dpi=20&lod={lod}').headers['ETag'] for lod in ('auto', 'raw', 'lttb')}
+    assert len(etags) == 3
+
+def test_unknown_lod_is_rejected(app_client):
+    response = app_client.get('/generate_ripeness_chart/sunkist@example.com?lod=smooth')
+    assert response.status_code == 400
+    assert 'lod' in response.get_json()['error']
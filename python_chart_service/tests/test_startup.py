@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmark import DEFERRED_MODULES, STARTUP_SCRIPT
+from conftest import SERVICE_DIR
+
+def test_heavy_modules_are_not_imported_until_needed(tmp_path):
+    env = dict(os.environ, CHART_DATA_PATH=str(tmp_path / 'empty.db'),
+               CHART_AGGREGATE_DB=str(tmp_path / 'aggregates.db'), CHART_CACHE_DIR='')
+    process = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, *DEFERRED_MODULES],
+                             capture_output=True, text=True, check=True, cwd=SERVICE_DIR, env=env)
+    run = json.loads(process.stdout.splitlines()[-1])
+    # Importing the app and answering /health loads none of them
+    assert run['loaded'] == []
+    assert run['import'] <= run['health'] <= run['ready']
+
+@pytest.fixture
+def generator(app_client):
+    import chart_generator
+
+    yield chart_generator
+    chart_generator._ready.clear()
+
+def test_ready_only_once_preloaded(generator, app_client):
+    generator._ready.clear()
+    response = app_client.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json()['checks'] == {'preloaded': False, 'data_backend': True}
+
+    generator.preload()
+    assert app_client.get('/ready').status_code == 200
+
+def test_not_ready_while_the_backend_circuit_is_open(generator, app_client, monkeypatch):
+    generator._ready.set()
+    monkeypatch.setattr(type(generator.data_source.breaker), 'state', property(lambda self: 'open'))
+    response = app_client.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json()['checks']['data_backend'] is False
+    # Liveness doesn't depend on the backend
+    health = app_client.get('/health')
+    assert health.status_code == 200
+    assert health.get_json()['data_backend'] == 'open'
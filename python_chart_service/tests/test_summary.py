@@ -0,0 +1,69 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from aggregate_store import AggregateStore, frame_rollups, summarize_rollups
+from conftest import BASE_TIME, scan_rows
+from scan_frame import load_scan_frame
+
+def daily_rows(scores_by_day, per_day=24):
+    """Rows with the given score on each day, one scan an hour"""
+    rows = []
+    for day, score in enumerate(scores_by_day):
+        for hour in range(per_day):
+            analyzed_at = BASE_TIME + timedelta(days=day, hours=hour)
+            rows.append({'id': str(uuid.UUID(int=len(rows) + 1)), 'ripeness_score': score,
+                         'analyzed_at': analyzed_at.isoformat(timespec='microseconds')})
+    return rows
+
+def summarize(rows):
+    return summarize_rollups(frame_rollups(load_scan_frame(rows)))
+
+def test_stored_rollups_summarize_like_the_scans(tmp_path, sqlite_source):
+    rows = scan_rows(500)
+    sqlite_source.replace_rows('sunkist_data', rows)
+    store = AggregateStore(str(tmp_path / 'aggregates.db'), sqlite_source)
+    store.refresh('sunkist_data')
+    stored, scanned = summarize_rollups(store.daily('sunkist_data')), summarize(rows)
+    assert stored['count'] == scanned['count'] == 500
+    assert stored['mean'] == pytest.approx(scanned['mean'])
+    assert stored['percentiles'] == pytest.approx(scanned['percentiles'])
+    assert stored['bucket_shares'] == scanned['bucket_shares']
+    assert stored['slope'] == pytest.approx(scanned['slope'])
+
+def test_percentiles_and_shares():
+    stats = summarize(daily_rows([2.0, 5.0, 12.0]))
+    p10, p50, p90 = (stats['percentiles'][name] for name in ('p10', 'p50', 'p90'))
+    assert 2.0 <= p10 <= 2.1
+    assert 5.0 <= p50 <= 5.1
+    assert 12.0 <= p90 <= 12.1
+    assert stats['bucket_shares'] == pytest.approx({'very_ripe': 1 / 3, 'just_ripe': 1 / 3, 'unripe': 1 / 3})
+
+def test_trend_is_the_slope_of_the_daily_means():
+    assert summarize(daily_rows([4.0, 5.0, 6.0, 7.0]))['slope'] == pytest.approx(1.0)
+    assert summarize(daily_rows([8.0]))['slope'] == 0.0
+
+def test_outlying_days_are_flagged():
+    scores = [8.0, 8.2, 7.9, 8.1, 8.0, 1.0, 8.1, 7.9]
+    daily = summarize(daily_rows(scores))['daily']
+    assert daily.index[daily['anomaly']].strftime('%Y-%m-%d').tolist() == ['2025-09-06']
+    # Too few days to tell an outlier from a trend
+    assert not summarize(daily_rows(scores[2:8]))['daily']['anomaly'].any()
+
+def test_summary_route_reports_the_window(app_client):
+    summary = app_client.get('/supplier_summary/sunkist@example.com?start=2025-09-02&end=2025-09-03').get_json()
+    assert summary['total_analyses'] == 144
+    assert [day['date'] for day in summary['daily']] == ['2025-09-02']
+    percentiles = summary['ripeness_percentiles']
+    assert percentiles['p10'] <= percentiles['p50'] <= percentiles['p90']
+    assert sum(summary['shelf_life_shares'].values()) == pytest.approx(1, abs=0.002)
+
+def test_rollup_and_scan_answers_agree(app_client):
+    # Day-aligned windows are answered from the rollups, others by scanning rows
+    rollups = app_client.get('/supplier_summary/sunkist@example.com?start=2025-09-02&end=2025-09-03').get_json()
+    scanned = app_client.get('/supplier_summary/sunkist@example.com'
+                             '?start=2025-09-02T00:00:00.000001Z&end=2025-09-03').get_json()
+    # The scan window starts just after the first scan of the day
+    assert scanned['total_analyses'] == rollups['total_analyses'] - 1
+    assert scanned['average_ripeness'] == pytest.approx(rollups['average_ripeness'], abs=0.1)
@@ -0,0 +1,88 @@
+import pytest
+
+from conftest import scan_rows
+from table_registry import TableRegistry, brand_table_name, supplier_table_name
+
+@pytest.mark.parametrize('email, table', [
+    ('sunkist@env.com', 'sunkist_data'),
+    ('Del.Monte@env.com', 'del_monte_data'),
+    ('dole--fresh@env.com', 'dole_fresh_data'),
+    ('_halos_@env.com', 'halos_data'),
+])
+def test_supplier_emails_map_to_brand_tables(email, table):
+    assert supplier_table_name(email) == table
+
+def test_brand_names_match_the_sql_helper():
+    assert brand_table_name('Del Monte') == 'del_monte_data'
+    assert brand_table_name("Trader Joe's") == 'trader_joe_s_data'
+
+class CountingSource:
+    """Wraps a source, counting its calls; can pretend it can't list tables"""
+
+    def __init__(self, source, can_list=True):
+        self.source = source
+        self.name = source.name
+        self.can_list = can_list
+        self.calls = {'list_tables': 0, 'fingerprint': 0, 'table_stats': 0}
+
+    def list_tables(self):
+        self.calls['list_tables'] += 1
+        if not self.can_list:
+            raise NotImplementedError()
+        return self.source.list_tables()
+
+    def fingerprint(self, table_name, start=None, end=None):
+        self.calls['fingerprint'] += 1
+        return self.source.fingerprint(table_name, start, end)
+
+    def table_stats(self, table_name):
+        self.calls['table_stats'] += 1
+        return self.source.table_stats(table_name)
+
+    def is_backend_error(self, exc):
+        return self.source.is_backend_error(exc)
+
+@pytest.fixture
+def source(sqlite_source):
+    sqlite_source.replace_rows('sunkist_data', scan_rows(20))
+    sqlite_source.replace_rows('halos_data', scan_rows(5))
+    return sqlite_source
+
+def test_one_listing_answers_every_lookup(source):
+    counting = CountingSource(source)
+    registry = TableRegistry(counting, ttl=300)
+    assert set(registry.tables()) == {'sunkist_data', 'halos_data'}
+    assert registry.exists('sunkist_data')
+    assert not registry.exists('dole_data')
+    assert counting.calls['list_tables'] == 1
+    assert counting.calls['fingerprint'] == 0
+
+def test_invalidate_rereads_the_listing(source):
+    registry = TableRegistry(source, ttl=300)
+    assert not registry.exists('dole_data')
+    source.replace_rows('dole_data', scan_rows(1))
+    assert not registry.exists('dole_data')
+    registry.invalidate()
+    assert registry.exists('dole_data')
+
+def test_tables_are_probed_when_the_source_cant_list_them(source):
+    counting = CountingSource(source, can_list=False)
+    registry = TableRegistry(counting, ttl=300)
+    assert registry.tables() is None
+    assert registry.exists('sunkist_data')
+    assert registry.exists('sunkist_data')
+    assert counting.calls['fingerprint'] == 1
+    assert not registry.exists('dole_data')
+    with pytest.raises(NotImplementedError):
+        registry.all_info()
+
+def test_stats_are_cached(source):
+    counting = CountingSource(source)
+    registry = TableRegistry(counting, ttl=300, stats_ttl=60)
+    info = registry.info('sunkist_data')
+    assert (info.count, info.first[:10], info.latest) == (20, '2025-09-01', scan_rows(20)[-1]['analyzed_at'])
+    assert 'ripeness_score' in info.columns
+    registry.info('sunkist_data')
+    assert counting.calls['table_stats'] == 1
+    assert registry.info('dole_data') is None
+    assert [info.name for info in registry.all_info()] == ['halos_data', 'sunkist_data']